@@ -25,7 +25,7 @@ from django.http import JsonResponse
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from users.views import ReviewerCustomRegisterView, VendorCustomRegisterView, ReviewerProfileView, VendorProfileView, ProtectedVendorDocView, UserProfileView, check_username_email, CookieTokenRefreshView, CustomVerifyEmailView, CustomResendEmailView, custom_logout
-from shops.views import AnnouncementView, ReplyView, CategoryView, RegionView, ReviewView, ShopSearchView, ShopDetailView, LikeDetailView, vendor_dashboard, vendor_reviews, reply_to_review, vendor_shops, create_vendor_shop, update_vendor_shop, add_shop_category, delete_vendor_shop, reviewer_dashboard, reviewer_reviews, FavouriteView, PublicAnnouncementView, AnnouncementDetailView
+from shops.views import AnnouncementView, ReplyView, CategoryView, RegionView, ReviewView, ShopSearchView, AutocompleteView, CacheStatsView, ShopDetailView, ShopPageView, LikeDetailView, vendor_dashboard, vendor_analytics, vendor_reviews, vendor_reviews_export, reply_to_review, vendor_shops, create_vendor_shop, update_vendor_shop, add_shop_category, delete_vendor_shop, reviewer_dashboard, reviewer_reviews, FavouriteView, PublicAnnouncementView, AnnouncementDetailView
 from ml.ml import ReviewSummaryView, ReviewFlagAIView
 from users.views import CustomLoginView
 from django.http import HttpResponseNotFound
@@ -88,6 +88,9 @@ urlpatterns = [
     path('shops/regions/',
          RegionView.as_view({'get': 'list'}), name='region-list'),
     path('shops/search/', ShopSearchView.as_view(), name='shop-search'),
+    path('shops/autocomplete/', AutocompleteView.as_view(),
+         name='shop-autocomplete'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
     path(
         'shops/<int:shop_id>/reviews/',
         ReviewView.as_view({'get': 'list', 'post': 'create'}),
@@ -112,6 +115,7 @@ urlpatterns = [
         name='shop-review-detail'
     ),
     path('shops/<int:shop_id>/', ShopDetailView.as_view(), name='shop-detail'),
+    path('shops/<int:shop_id>/page/', ShopPageView.as_view(), name='shop-page'),
     path('shops/<int:shop_id>/likes/<int:review_id>/',
          LikeDetailView.as_view(), name='like-detail'),
     path('shops/<int:shop_id>/announcements/',
@@ -120,7 +124,10 @@ urlpatterns = [
 
     # Vendor API endpoints
     path('vendor/dashboard/', vendor_dashboard, name='vendor_dashboard'),
+    path('vendor/analytics/', vendor_analytics, name='vendor_analytics'),
     path('vendor/reviews/', vendor_reviews, name='vendor_reviews'),
+    path('vendor/reviews/export/', vendor_reviews_export,
+         name='vendor_reviews_export'),
     path('vendor/reviews/<int:review_id>/reply/',
          reply_to_review, name='reply_to_review'),
     path('vendor/shops/', vendor_shops, name='vendor_shops'),
@@ -48,6 +48,53 @@ DATABASES = {
     }
 }
 
+# Cache versions (shops.cache.bump_namespace), dashboard locks and hit
+# counters must be shared by every web worker, the detection worker and the
+# outbox consumers, so deployments set REDIS_URL (e.g. redis://localhost:6379/0)
+# and size-bound it with Redis' own maxmemory/allkeys-lru settings.
+# Without it each process gets its own LocMemCache, which is only correct
+# for a single-process runserver.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'reviewpedia',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reviewpedia',
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
+    }
+
+# Seconds a cached shop search result is served before being recomputed
+SHOP_SEARCH_CACHE_TTL = 60
+
+# Seconds before the in-process autocomplete index is fully rebuilt, to pick
+# up shops changed by other worker processes
+AUTOCOMPLETE_REFRESH_SECONDS = 300
+
+# Seconds a generated review summary is kept (it is also dropped as soon as
+# one of the shop's reviews changes)
+REVIEW_SUMMARY_CACHE_TTL = 60 * 60
+
+# Seconds a vendor/reviewer dashboard response is cached. Changes to the
+# user's own shops, reviews, replies and likes invalidate it immediately; the
+# TTL bounds staleness from everything else (e.g. other users' reviews of
+# shops a reviewer visited)
+DASHBOARD_CACHE_TTL = 5 * 60
+
+# Failed attempts at an outbox batch before the consumer quarantines the
+# events it keeps failing on and moves past them
+OUTBOX_MAX_ATTEMPTS = 5
+
 
 # Application definition
 INSTALLED_APPS = [
@@ -57,6 +104,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.sites',
+    'django.contrib.postgres',
 
     'allauth',
     'allauth.account',
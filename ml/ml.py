@@ -1,15 +1,17 @@
 import requests
 import re
 import nltk
+from functools import lru_cache
 
 from nltk.metrics import BigramAssocMeasures
 from nltk.collocations import BigramCollocationFinder
 from nltk import pos_tag
 from nltk.tokenize import word_tokenize
 from nltk.probability import FreqDist
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from django.core.cache import cache
 from rest_framework.views import APIView
 from shops.models import Review
+from shops.cache import review_summary_key, review_summary_timeout
 from rest_framework.response import Response
 from rest_framework import permissions
 from transformers import pipeline
@@ -20,13 +22,14 @@ nltk.download('stopwords')
 nltk.download('averaged_perceptron_tagger_eng')
 nltk.download('punkt_tab')
 
-# Load the model and tokenizer locally
-tokenizer = AutoTokenizer.from_pretrained("facebook/bart-large-cnn")
-model = AutoModelForSeq2SeqLM.from_pretrained("facebook/bart-large-cnn")
 
-
-# Use the model in the pipeline
-summarizer = pipeline("summarization", model=model, tokenizer=tokenizer)
+# The pipeline is loaded on first use rather than at import, so processes
+# that only import this module (every web worker, through the URLconf) do
+# not hold the model in memory until they actually need it
+@lru_cache(maxsize=None)
+def get_detector():
+    return pipeline("text-classification",
+                    model="Hello-SimpleAI/chatgpt-detector-roberta")
 
 
 def fetch_reviews(shop_id):
@@ -158,6 +161,9 @@ class ReviewSummaryView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, shop_id):
+        cached = cache.get(review_summary_key(shop_id))
+        if cached is not None:
+            return Response(cached)
         try:
             # Fetch reviews for the shop
             reviews = Review.objects.filter(
@@ -177,18 +183,29 @@ class ReviewSummaryView(APIView):
             # Enhance summary with sentiment overview
             sentiment_summary = enhance_summary_with_sentiment(sentiments)
 
-            # Prepare the response
-            return Response({
+            # Prepare the response, cached until the shop's reviews change
+            data = {
                 "sentiments": sentiments,
                 "summary": sentiment_summary
-            })
+            }
+            cache.set(review_summary_key(shop_id), data, review_summary_timeout())
+            return Response(data)
         except Exception as e:
             print("error", e)
             return Response({"error": str(e)}, status=500)
 
 
-detector = pipeline("text-classification",
-                    model="Hello-SimpleAI/chatgpt-detector-roberta")
+DETECTOR_LABELS = {'Human': False, 'ChatGPT': True}
+
+
+def detect_ai_generated(texts, batch_size=16):
+    """
+    Run the detector over many texts at once, returning (is_ai_generated,
+    score) per text in the same order. is_ai_generated is None if the
+    detector returned a label it is not known to produce.
+    """
+    results = get_detector()(list(texts), batch_size=batch_size, truncation=True)
+    return [(DETECTOR_LABELS.get(result['label']), result['score']) for result in results]
 
 
 class ReviewFlagAIView(APIView):
@@ -201,7 +218,7 @@ class ReviewFlagAIView(APIView):
             review_text = review.description
 
             # Detect if the review is AI-generated
-            result = detector(review_text)
+            result = get_detector()(review_text)
             print(result[0]['label'], result[0]['score'])
 
             return Response({
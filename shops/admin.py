@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Region, Shop, Category, ShopCategory, Dish, Review
+from .models import Region, Shop, Category, ShopCategory, Dish, Review, ShopReviewStats, QuarantinedOutboxEvent
 
 admin.site.register(Region)
 admin.site.register(Shop)
@@ -7,3 +7,5 @@ admin.site.register(Category)
 admin.site.register(ShopCategory)
 admin.site.register(Dish)
 admin.site.register(Review)
+admin.site.register(ShopReviewStats)
+admin.site.register(QuarantinedOutboxEvent)
@@ -0,0 +1,173 @@
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from datetime import date, datetime, time, timedelta
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Shop, Review, ShopReviewStats, ShopDailyReviewStats
+from .cache import bump_namespace
+
+RATINGS = range(1, 6)
+STATS_FIELDS = ['review_count', 'rating_sum', 'average_rating', 'freefood_count'] + \
+    [f'rating_{star}_count' for star in RATINGS]
+DAILY_FIELDS = ['review_count', 'rating_sum', 'ai_generated_count', 'freefood_count'] + \
+    [f'rating_{star}_count' for star in RATINGS]
+
+
+def review_state(review):
+    """
+    Snapshot of the review fields the stats depend on, as
+    (rating, has_freefood, day, is_ai_generated).
+    """
+    has_freefood = Review._meta.get_field(
+        'has_freefood').to_python(review.has_freefood)
+    return (int(review.rating), bool(has_freefood),
+            timezone.localdate(review.created_at), bool(review.is_ai_generated))
+
+
+def state_payload(state):
+    """
+    A review_state() in JSON form, for outbox event payloads.
+    """
+    if state is None:
+        return None
+    rating, has_freefood, day, is_ai_generated = state
+    return [rating, has_freefood, day.isoformat(), is_ai_generated]
+
+
+def state_from_payload(payload):
+    if payload is None:
+        return None
+    rating, has_freefood, day, is_ai_generated = payload
+    return (rating, has_freefood, date.fromisoformat(day), is_ai_generated)
+
+
+def recount_shop_days(shop_days, chunk_size=200):
+    """
+    Recompute the daily rows for the given (shop_id, day) pairs from the
+    reviews table, then the stats rows of their shops. Returns the ids of
+    the shops that still exist.
+
+    Used by the shop_stats outbox consumer. A recount does not depend on
+    what the rows held before (or on whether they existed), so it cannot
+    count a review twice after a rebuild, and replaying an event is harmless.
+    """
+    shop_days = sorted(set(shop_days))
+    existing = set(Shop.objects.filter(
+        shop_id__in={shop_id for shop_id, _ in shop_days}).values_list('shop_id', flat=True))
+    shop_days = [(shop_id, day) for shop_id, day in shop_days if shop_id in existing]
+
+    with transaction.atomic():
+        for start in range(0, len(shop_days), chunk_size):
+            chunk = shop_days[start:start + chunk_size]
+            window = Q()
+            for shop_id, day in chunk:
+                day_start = timezone.make_aware(datetime.combine(day, time.min))
+                window |= Q(shop_id=shop_id, created_at__gte=day_start,
+                            created_at__lt=day_start + timedelta(days=1))
+            counted = {(row.shop_id, row.day): row
+                       for row in _daily_rows(Review.objects.filter(window))}
+            ShopDailyReviewStats.objects.bulk_create(
+                [counted.get((shop_id, day)) or ShopDailyReviewStats(shop_id=shop_id, day=day)
+                 for shop_id, day in chunk],
+                update_conflicts=True,
+                unique_fields=['shop', 'day'],
+                update_fields=DAILY_FIELDS,
+            )
+        if existing:
+            rebuild_shop_stats(sorted(existing))
+    return existing
+
+
+def touch_shop_stats(review_id):
+    """
+    Mark the stats row of the review's shop as changed, for changes that
+    affect the shop's review listing but not its aggregates (e.g. likes).
+    """
+    ShopReviewStats.objects.filter(shop__reviews=review_id).update(
+        updated_at=timezone.now())
+
+
+def rebuild_shop_stats(shop_ids=None, chunk_size=1000):
+    """
+    Recompute the stats rows from the reviews table, for the given shops or
+    for every shop. Returns the number of shops processed.
+    """
+    shops = Shop.objects.order_by('shop_id')
+    if shop_ids is not None:
+        shops = shops.filter(shop_id__in=shop_ids)
+    all_ids = list(shops.values_list('shop_id', flat=True))
+
+    for start in range(0, len(all_ids), chunk_size):
+        chunk = all_ids[start:start + chunk_size]
+        rows = Review.objects.filter(shop_id__in=chunk).values('shop_id').annotate(
+            review_count=Count('review_id'),
+            rating_sum=Sum('rating'),
+            freefood_count=Count('review_id', filter=Q(has_freefood=True)),
+            **{f'rating_{star}_count': Count('review_id', filter=Q(rating=star)) for star in RATINGS}
+        )
+        by_shop = {row.pop('shop_id'): row for row in rows}
+
+        stats = []
+        for shop_id in chunk:
+            row = by_shop.get(shop_id, {})
+            review_count = row.get('review_count', 0)
+            rating_sum = row.get('rating_sum') or 0
+            stats.append(ShopReviewStats(
+                shop_id=shop_id,
+                review_count=review_count,
+                rating_sum=rating_sum,
+                average_rating=rating_sum / review_count if review_count else None,
+                freefood_count=row.get('freefood_count', 0),
+                **{f'rating_{star}_count': row.get(f'rating_{star}_count', 0) for star in RATINGS}
+            ))
+
+        with transaction.atomic():
+            ShopReviewStats.objects.bulk_create(
+                stats,
+                update_conflicts=True,
+                unique_fields=['shop'],
+                update_fields=STATS_FIELDS + ['updated_at'],
+            )
+
+    # Bulk writes bypass the model signals that normally invalidate caches
+    transaction.on_commit(lambda: bump_namespace('reviews'))
+    return len(all_ids)
+
+
+def _daily_rows(reviews):
+    rows = reviews.annotate(day=TruncDate('created_at')).values('shop_id', 'day').annotate(
+        review_count=Count('review_id'),
+        rating_sum=Sum('rating'),
+        ai_generated_count=Count('review_id', filter=Q(is_ai_generated=True)),
+        freefood_count=Count('review_id', filter=Q(has_freefood=True)),
+        **{f'rating_{star}_count': Count('review_id', filter=Q(rating=star)) for star in RATINGS}
+    ).order_by()
+    return [ShopDailyReviewStats(**row) for row in rows]
+
+
+def rebuild_daily_stats(shop_ids=None, chunk_size=200):
+    """
+    Recompute the per-day stats rows from the reviews table, for the given
+    shops or for every shop. Returns the number of shops processed.
+    """
+    shops = Shop.objects.order_by('shop_id')
+    if shop_ids is not None:
+        shops = shops.filter(shop_id__in=shop_ids)
+    all_ids = list(shops.values_list('shop_id', flat=True))
+
+    for start in range(0, len(all_ids), chunk_size):
+        chunk = all_ids[start:start + chunk_size]
+        with transaction.atomic():
+            # Zeroed rather than deleted before counting, as recount_shop_days
+            # leaves the days that no longer have reviews
+            ShopDailyReviewStats.objects.filter(shop_id__in=chunk).update(
+                **{field: 0 for field in DAILY_FIELDS})
+            ShopDailyReviewStats.objects.bulk_create(
+                _daily_rows(Review.objects.filter(shop_id__in=chunk)),
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['shop', 'day'],
+                update_fields=DAILY_FIELDS,
+            )
+
+    return len(all_ids)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ShopsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shops'
+
+    def ready(self):
+        from . import signals, consumers  # noqa: F401
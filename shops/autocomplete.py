@@ -0,0 +1,135 @@
+import bisect
+import re
+import threading
+import time
+from django.conf import settings
+from .models import Shop, Category
+
+_WORD_RE = re.compile(r'\w+')
+SHOP, CATEGORY = 'shop', 'category'
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+def _name_keys(name):
+    # Index the name from every word start, so "rice" also finds "Chicken Rice"
+    words = normalize(name).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    """
+    In-process sorted array of (key, kind, id) tuples searched with bisect.
+
+    Shops and categories are upserted/removed as they change (see
+    shops.signals); the whole index is also rebuilt every
+    AUTOCOMPLETE_REFRESH_SECONDS to pick up writes made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._item_keys = {}
+        self._items = {}
+        self._built_at = None
+
+    def _refresh_seconds(self):
+        return getattr(settings, 'AUTOCOMPLETE_REFRESH_SECONDS', 300)
+
+    def build(self):
+        keys, item_keys, items = [], {}, {}
+        image_field = Shop._meta.get_field('shop_image')
+        for shop in Shop.objects.values_list('shop_id', 'shop_name', 'shop_image').iterator():
+            shop_id, name, image = shop
+            items[(SHOP, shop_id)] = {
+                'shop_id': shop_id,
+                'shop_name': name,
+                'shop_image': image_field.storage.url(image) if image else None,
+            }
+        for category in Category.objects.values('category_id', 'category_name', 'category_image'):
+            items[(CATEGORY, category['category_id'])] = category
+
+        for (kind, item_id), payload in items.items():
+            name_keys = _name_keys(payload[f'{kind}_name'])
+            item_keys[(kind, item_id)] = name_keys
+            keys.extend((key, kind, item_id) for key in name_keys)
+        keys.sort()
+
+        with self._lock:
+            self._keys, self._item_keys, self._items = keys, item_keys, items
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self._refresh_seconds():
+            self.build()
+
+    def remove(self, kind, item_id):
+        with self._lock:
+            for key in self._item_keys.pop((kind, item_id), []):
+                entry = (key, kind, item_id)
+                pos = bisect.bisect_left(self._keys, entry)
+                if pos < len(self._keys) and self._keys[pos] == entry:
+                    del self._keys[pos]
+            self._items.pop((kind, item_id), None)
+
+    def upsert(self, kind, item_id, payload):
+        with self._lock:
+            if self._built_at is None:
+                return  # Built lazily on the first lookup
+            self.remove(kind, item_id)
+            name_keys = _name_keys(payload[f'{kind}_name'])
+            for key in name_keys:
+                bisect.insort(self._keys, (key, kind, item_id))
+            self._item_keys[(kind, item_id)] = name_keys
+            self._items[(kind, item_id)] = payload
+
+    def lookup(self, prefix, limit=8):
+        """
+        Shops and categories whose name has a word starting with `prefix`.
+        Names that start with the prefix come first, then shorter names.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return {SHOP: [], CATEGORY: []}
+        self._ensure_fresh()
+
+        matches = {SHOP: {}, CATEGORY: {}}
+        with self._lock:
+            pos = bisect.bisect_left(self._keys, (prefix,))
+            # Scan a bounded window so very common prefixes stay cheap
+            for key, kind, item_id in self._keys[pos:pos + limit * 20]:
+                if not key.startswith(prefix):
+                    break
+                payload = self._items[(kind, item_id)]
+                is_name_start = self._item_keys[(kind, item_id)][0] == key
+                current = matches[kind].get(item_id)
+                if current is None or is_name_start:
+                    matches[kind][item_id] = (not is_name_start, payload)
+
+        results = {}
+        for kind, found in matches.items():
+            ranked = sorted(found.values(), key=lambda m: (
+                m[0], len(m[1][f'{kind}_name']), m[1][f'{kind}_name']))
+            results[kind] = [payload for _, payload in ranked[:limit]]
+        return results
+
+
+shop_index = PrefixIndex()
+
+
+def shop_payload(shop):
+    return {
+        'shop_id': shop.shop_id,
+        'shop_name': shop.shop_name,
+        'shop_image': shop.shop_image.url if shop.shop_image else None,
+    }
+
+
+def category_payload(category):
+    return {
+        'category_id': category.category_id,
+        'category_name': category.category_name,
+        'category_image': category.category_image,
+    }
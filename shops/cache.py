@@ -0,0 +1,194 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Namespaces the shop search results depend on
+SEARCH_NAMESPACES = ('shops', 'reviews')
+SEARCH_CACHE_ENDPOINT = 'shop_search'
+
+_LIST_PARAMS = ('categories', 'regions')
+_FLAG_PARAMS = ('is_vegetarian', 'is_halal', 'count', 'facets')
+_FLOAT_PARAMS = ('lat', 'lng', 'radius_m')
+_TEXT_PARAMS = ('sort_by', 'page', 'pagination', 'cursor')
+
+
+def _seed_version():
+    # Seeded from the clock so a counter that was evicted never comes back
+    # with a version number an older cache entry was stored under
+    return time.time_ns() // 1000
+
+
+def namespace_version(name):
+    key = f'ns:{name}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _seed_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_namespace(*names):
+    """
+    Invalidate every cache entry stored under the given namespaces.
+    """
+    for name in names:
+        try:
+            cache.incr(f'ns:{name}')
+        except ValueError:
+            cache.set(f'ns:{name}', _seed_version(), timeout=None)
+
+
+def record_cache_access(endpoint, hit):
+    key = f'cache_stats:{endpoint}:{"hits" if hit else "misses"}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def cache_access_stats(endpoint):
+    hits = cache.get(f'cache_stats:{endpoint}:hits', 0)
+    misses = cache.get(f'cache_stats:{endpoint}:misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def normalize_search_params(params):
+    """
+    Canonical form of the ShopSearchView query parameters, so equivalent
+    requests (reordered ids, casing, ignored flags) share one cache entry.
+    """
+    normalized = {}
+    q = params.get('q', '').strip().lower()
+    if q:
+        normalized['q'] = ' '.join(q.split())
+    for name in _LIST_PARAMS:
+        ids = sorted({int(i) for i in params.get(name, '').split(',') if i.isdigit()})
+        if ids:
+            normalized[name] = ids
+    for name in _FLAG_PARAMS:
+        if params.get(name) == 'true':
+            normalized[name] = True
+    for name in _FLOAT_PARAMS:
+        value = params.get(name)
+        if value:
+            try:
+                normalized[name] = float(value)
+            except ValueError:
+                normalized[name] = value
+    for name in _TEXT_PARAMS:
+        value = params.get(name)
+        if value:
+            normalized[name] = value
+    return normalized
+
+
+def search_cache_key(request):
+    versions = [namespace_version(name) for name in SEARCH_NAMESPACES]
+    # The host is part of the key because paginated responses embed
+    # absolute next/previous links
+    raw = json.dumps([request.get_host(), normalize_search_params(request.query_params)],
+                     sort_keys=True)
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'shop_search:{":".join(map(str, versions))}:{digest}'
+
+
+def search_cache_timeout():
+    return getattr(settings, 'SHOP_SEARCH_CACHE_TTL', 60)
+
+
+def review_summary_key(shop_id):
+    # Deleted by shops.signals whenever one of the shop's reviews changes
+    return f'review_summary:{shop_id}'
+
+
+def review_summary_timeout():
+    return getattr(settings, 'REVIEW_SUMMARY_CACHE_TTL', 60 * 60)
+
+
+# Per-user dashboard responses, keyed by the owning vendor or reviewer
+VENDOR_DASHBOARD_ENDPOINT = 'vendor_dashboard'
+VENDOR_SHOPS_ENDPOINT = 'vendor_shops'
+REVIEWER_DASHBOARD_ENDPOINT = 'reviewer_dashboard'
+DASHBOARD_ENDPOINTS = (VENDOR_DASHBOARD_ENDPOINT, VENDOR_SHOPS_ENDPOINT, REVIEWER_DASHBOARD_ENDPOINT)
+
+# Seconds one request may spend recomputing a dashboard before others stop
+# waiting for it
+DASHBOARD_LOCK_TIMEOUT = 30
+# Seconds a request with no stale copy to serve waits for that recompute
+DASHBOARD_LOCK_WAIT = 2.0
+
+
+def vendor_namespace(vendor_id):
+    return f'vendor:{vendor_id}'
+
+
+def reviewer_namespace(reviewer_id):
+    return f'reviewer:{reviewer_id}'
+
+
+def invalidate_dashboards(vendor_ids=(), reviewer_ids=()):
+    """
+    Invalidate the cached dashboards of these vendors and reviewers once the
+    current transaction commits, so a concurrent request cannot cache data
+    read before the commit under the new version.
+    """
+    names = [vendor_namespace(i) for i in set(vendor_ids) if i is not None] + \
+        [reviewer_namespace(i) for i in set(reviewer_ids) if i is not None]
+    if names:
+        transaction.on_commit(lambda: bump_namespace(*names))
+
+
+def dashboard_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', 5 * 60)
+
+
+def cached_dashboard(endpoint, namespace, compute):
+    """
+    Return (data, status) for one user's dashboard endpoint, where status is
+    'HIT', 'STALE' or 'MISS'. On a miss `compute()` builds the response data,
+    or returns None if it must not be cached.
+
+    Concurrent misses recompute once: the request that takes the lock
+    computes, while the others serve the user's previous (stale) response,
+    or wait briefly for the fresh one if there is none. The lock and the
+    namespace versions only coordinate processes that share the cache, so
+    deployments with several workers need the shared backend (REDIS_URL).
+    """
+    key = f'dashboard:{endpoint}:{namespace}'
+    fresh_key = f'{key}:{namespace_version(namespace)}'
+    data = cache.get(fresh_key)
+    record_cache_access(endpoint, hit=data is not None)
+    if data is not None:
+        return data, 'HIT'
+
+    lock_key = f'{fresh_key}:lock'
+    if not cache.add(lock_key, 1, timeout=DASHBOARD_LOCK_TIMEOUT):
+        stale = cache.get(f'{key}:stale')
+        if stale is not None:
+            return stale, 'STALE'
+        deadline = time.monotonic() + DASHBOARD_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(fresh_key)
+            if data is not None:
+                return data, 'HIT'
+        return compute(), 'MISS'
+
+    try:
+        data = compute()
+        if data is not None:
+            cache.set(fresh_key, data, dashboard_timeout())
+            # Kept past the TTL: only served while a recompute is running
+            cache.set(f'{key}:stale', data, None)
+    finally:
+        cache.delete(lock_key)
+    return data, 'MISS'
@@ -0,0 +1,63 @@
+"""
+Outbox consumers that keep derived review data in step.
+
+The shop stats (total and daily) are owned by the shop_stats consumer: the
+request handlers and the detection worker only record the review's state
+before and after the change, and the consumer recounts the shop-days those
+states fall on (and the shops' totals) from the reviews table. Recounts
+are idempotent, so they agree with `rebuild_shop_stats` and
+`rebuild_daily_review_stats` whichever runs first.
+
+Reaction counts and reviewer counters are still updated inline by the
+handlers; their consumers recompute them from the source tables for the
+reviews and reviewers that changed, which repairs drift (e.g. from writes
+made outside the API) and is safe to repeat.
+"""
+from django.db import transaction
+from .aggregates import recount_shop_days, state_from_payload
+from .cache import bump_namespace, invalidate_dashboards
+from .outbox import REVIEW_EVENTS, REACTION_EVENTS, SHOP_DELETED, consumer
+from .models import Shop, Review
+from .reactions import rebuild_reaction_counts
+from .reviewers import recount_reviewers
+
+
+@consumer('shop_stats', event_types=REVIEW_EVENTS)
+def refresh_shop_stats(events):
+    shop_days = set()
+    for event in events:
+        for state in (event.payload['old'], event.payload['new']):
+            if state is not None:
+                shop_days.add((event.payload['shop_id'], state_from_payload(state)[2]))
+    shop_ids = recount_shop_days(shop_days)
+    if not shop_ids:
+        return
+    # The readers of the stats were invalidated when the reviews changed,
+    # which may have been before this batch was recounted
+    transaction.on_commit(lambda: bump_namespace('reviews'))
+    invalidate_dashboards(
+        vendor_ids=Shop.objects.filter(shop_id__in=shop_ids).values_list('vendor_id', flat=True),
+        reviewer_ids={event.payload['reviewer_id'] for event in events
+                      if event.payload['shop_id'] in shop_ids})
+
+
+@consumer('reaction_counts', event_types=REACTION_EVENTS)
+def refresh_reaction_counts(events):
+    rebuild_reaction_counts(sorted({event.payload['review_id'] for event in events}))
+
+
+@consumer('reviewer_counts', event_types=REVIEW_EVENTS + REACTION_EVENTS + (SHOP_DELETED,))
+def refresh_reviewer_counts(events):
+    reviewer_ids = {event.payload['reviewer_id'] for event in events
+                    if event.event_type in REVIEW_EVENTS}
+    # A deleted shop takes its reviews with it
+    for event in events:
+        if event.event_type == SHOP_DELETED:
+            reviewer_ids.update(event.payload.get('reviewer_ids', []))
+    # Reaction events name the reacting reviewer; the counters belong to
+    # the reviewed review's author
+    review_ids = {event.payload['review_id'] for event in events
+                  if event.event_type in REACTION_EVENTS}
+    reviewer_ids.update(Review.objects.filter(
+        review_id__in=review_ids).values_list('reviewer_id', flat=True))
+    recount_reviewers(sorted(reviewer_ids))
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .aggregates import review_state, state_payload
+from .models import Review, DetectionJob
+from .outbox import REVIEW_UPDATED, record_event, review_payload
+
+# Seconds a claimed batch is reserved for its worker before other workers
+# may pick it up again
+DEFAULT_LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+
+def enqueue_detection(review):
+    """
+    Queue the review for AI-generated detection and mark it pending. Call in
+    the same transaction as the review write.
+    """
+    now = timezone.now()
+    DetectionJob.objects.update_or_create(
+        review=review,
+        defaults={'requested_at': now, 'available_at': now, 'attempts': 0},
+    )
+    if review.detection_status != Review.DetectionStatus.PENDING:
+        Review.objects.filter(review_id=review.review_id).update(
+            detection_status=Review.DetectionStatus.PENDING)
+        review.detection_status = Review.DetectionStatus.PENDING
+
+
+def claim_jobs(batch_size, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Reserve up to `batch_size` due jobs for this worker. Rows locked by
+    another worker's claim are skipped rather than waited for.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            DetectionJob.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(available_at__lte=now)
+            .select_related('review')
+            .order_by('available_at')[:batch_size]
+        )
+        if jobs:
+            DetectionJob.objects.filter(review_id__in=[job.review_id for job in jobs]).update(
+                available_at=now + timedelta(seconds=lease_seconds), attempts=F('attempts') + 1)
+            for job in jobs:
+                job.attempts += 1
+    return jobs
+
+
+def _finish(job, **review_fields):
+    # Only if the review was not edited (and re-queued) since the claim
+    with transaction.atomic():
+        deleted, _ = DetectionJob.objects.filter(
+            review_id=job.review_id, requested_at=job.requested_at).delete()
+        if deleted:
+            review = Review.objects.select_for_update().get(review_id=job.review_id)
+            old_state = review_state(review)
+            Review.objects.filter(review_id=job.review_id).update(
+                updated_at=timezone.now(), **review_fields)
+            if 'is_ai_generated' in review_fields:
+                # The shop_stats consumer keeps the daily AI-generated
+                # counts in step from this event
+                review.is_ai_generated = review_fields['is_ai_generated']
+                record_event(REVIEW_UPDATED, **review_payload(review),
+                             old=state_payload(old_state), new=state_payload(review_state(review)))
+    return bool(deleted)
+
+
+def process_jobs(jobs, batch_size=16, on_error=None):
+    """
+    Run the detector over one claimed batch and write the results back.
+    Returns (done, failed) counts; jobs that failed but still have attempts
+    left are retried once their lease expires.
+    """
+    # Imported here so the worker only loads ml.ml (and with it nltk and
+    # transformers) once it has jobs; the model itself loads on first use
+    from ml.ml import detect_ai_generated
+
+    def detect(batch):
+        try:
+            return detect_ai_generated(
+                [job.review.description or '' for job in batch], batch_size=batch_size)
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            return None
+
+    results = detect(jobs)
+    if results is None:
+        # Retry one by one so a single bad review does not fail the batch
+        results = [(detect([job]) or [(None, None)])[0] for job in jobs]
+
+    done = failed = 0
+    for job, (is_ai_generated, score) in zip(jobs, results):
+        if is_ai_generated is not None:
+            done += _finish(
+                job,
+                is_ai_generated=is_ai_generated,
+                score=Decimal(str(round(score, 4))),
+                detection_status=Review.DetectionStatus.DONE,
+            )
+        elif job.attempts >= MAX_ATTEMPTS:
+            failed += _finish(job, detection_status=Review.DetectionStatus.FAILED)
+    return done, failed
@@ -0,0 +1,77 @@
+import csv
+import json
+
+EXPORT_TYPES = ('ndjson', 'csv')
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_COLUMNS = [
+    'review_id', 'shop_id', 'shop_name', 'reviewer_name', 'rating', 'description',
+    'created_at', 'updated_at', 'like_count', 'dislike_count', 'is_ai_generated',
+    'reply_count', 'last_reply', 'last_reply_date',
+]
+
+
+def export_queryset(reviews):
+    """
+    Everything an export row reads, joined or prefetched per chunk: with
+    iterator(chunk_size=...) the replies are fetched once per chunk of reviews.
+    """
+    return reviews.select_related('shop', 'reviewer__user').prefetch_related(
+        'replies').order_by('review_id')
+
+
+def review_rows(reviews, chunk_size=EXPORT_CHUNK_SIZE):
+    # iterator() reads through a server-side cursor on Postgres, so only one
+    # chunk of reviews is held in memory at a time
+    for review in export_queryset(reviews).iterator(chunk_size=chunk_size):
+        replies = sorted(review.replies.all(), key=lambda reply: reply.reply_date)
+        yield {
+            'review_id': review.review_id,
+            'shop_id': review.shop_id,
+            'shop_name': review.shop.shop_name,
+            'reviewer_name': review.reviewer.user.username,
+            'rating': review.rating,
+            'description': review.description or '',
+            'created_at': review.created_at.isoformat(),
+            'updated_at': review.updated_at.isoformat() if review.updated_at else None,
+            'like_count': review.like_count,
+            'dislike_count': review.dislike_count,
+            'is_ai_generated': review.is_ai_generated,
+            'replies': [{
+                'reply_id': reply.reply_id,
+                'reply_description': reply.reply_description,
+                'reply_date': reply.reply_date.isoformat(),
+            } for reply in replies],
+        }
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+class _Echo:
+    # csv.writer only needs an object with write(); return each line instead
+    # of buffering it
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        replies = row['replies']
+        last_reply = replies[-1] if replies else None
+        row = {
+            **row,
+            'reply_count': len(replies),
+            'last_reply': last_reply['reply_description'] if last_reply else '',
+            'last_reply_date': last_reply['reply_date'] if last_reply else '',
+        }
+        yield writer.writerow([row[column] for column in CSV_COLUMNS])
+
+
+def export_lines(reviews, export_type):
+    rows = review_rows(reviews)
+    return csv_lines(rows) if export_type == 'csv' else ndjson_lines(rows)
@@ -0,0 +1,62 @@
+import math
+from django.db.models import ExpressionWrapper, FloatField
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_M = 6371008.8
+DEFAULT_RADIUS_M = 2000
+MAX_RADIUS_M = 50000
+
+
+def parse_point(lat, lng):
+    """
+    Parse lat/lng query parameters, raising ValueError when they are not a
+    valid coordinate pair.
+    """
+    lat, lng = float(lat), float(lng)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('Coordinates out of range')
+    return lat, lng
+
+
+def bounding_box(lat, lng, radius_m):
+    """
+    Smallest lat/lng box containing every point within radius_m of (lat, lng).
+    """
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)), 180)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+def distance_expression(lat, lng):
+    """
+    Haversine distance in metres from (lat, lng) to the shop's coordinates.
+    """
+    shop_lat = Radians(Cast('latitude', FloatField()))
+    shop_lng = Radians(Cast('longitude', FloatField()))
+    a = (
+        Power(Sin((shop_lat - math.radians(lat)) / 2), 2) +
+        math.cos(math.radians(lat)) * Cos(shop_lat) *
+        Power(Sin((shop_lng - math.radians(lng)) / 2), 2)
+    )
+    # Least() guards asin against rounding just above 1 for antipodal points
+    return ExpressionWrapper(
+        2 * EARTH_RADIUS_M * ASin(Least(Sqrt(a), 1.0)),
+        output_field=FloatField()
+    )
+
+
+def filter_near(queryset, lat, lng, radius_m):
+    """
+    Restrict shops to those within radius_m of (lat, lng), annotated with
+    `distance_m`. The bounding box is matched against the (latitude,
+    longitude) index first, so exact distances are only computed for shops
+    inside the box.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_m)
+    return queryset.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng),
+    ).annotate(
+        distance_m=distance_expression(lat, lng)
+    ).filter(distance_m__lte=radius_m)
@@ -0,0 +1,345 @@
+import csv
+import json
+import time
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from users.models import Reviewer
+from .aggregates import rebuild_shop_stats, rebuild_daily_stats
+from .cache import review_summary_key, invalidate_dashboards
+from .outbox import consumer_lock
+from .reviewers import recount_reviewers
+from .models import Shop, Review, DetectionJob, ReviewImportCheckpoint
+
+FORMATS = ('json', 'ndjson', 'csv')
+# Skipped rows are reported individually up to this many
+MAX_SKIP_MESSAGES = 20
+
+
+def guess_format(path):
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if path.endswith('.csv'):
+        return 'csv'
+    return 'json'
+
+
+def iter_json_array(fp, chunk_size=64 * 1024):
+    """
+    Yield the elements of a top-level JSON array one by one, reading the file
+    in chunks instead of loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer, eof = '', False
+    started = False
+    while True:
+        buffer = buffer.lstrip()
+        if started and buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if buffer:
+            if not started:
+                if buffer[0] != '[':
+                    raise ValueError('Expected a JSON array')
+                buffer, started = buffer[1:], True
+                continue
+            if buffer[0] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # An element cut off at the chunk boundary can still decode
+                # (e.g. a number), so only trust it once more input follows
+                if end < len(buffer) or eof:
+                    yield item
+                    buffer = buffer[end:]
+                    continue
+        elif eof:
+            raise ValueError('Unexpected end of JSON array')
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+class UnreadableRecord:
+    """
+    Stands in for an NDJSON or CSV line that could not be decoded, so the
+    line is skipped like any other invalid record instead of stopping the
+    import.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+def iter_ndjson(fp):
+    for line in fp:
+        if line.strip():
+            try:
+                yield json.loads(line.decode('utf-8'))
+            except ValueError as e:
+                yield UnreadableRecord(f'invalid JSON line: {e}')
+
+
+def iter_csv(fp):
+    decode_errors = []
+
+    def lines():
+        for line in fp:
+            try:
+                yield line.decode('utf-8')
+            except UnicodeDecodeError as e:
+                decode_errors.append(e)
+                yield line.decode('utf-8', 'replace')
+
+    reader = csv.DictReader(lines())
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            record = UnreadableRecord(f'malformed CSV row: {e}')
+        if decode_errors:
+            record = UnreadableRecord(f'not valid UTF-8: {decode_errors[0]}')
+            decode_errors.clear()
+        yield record
+
+
+def iter_records(path, fmt):
+    """
+    Yield the records of the file. Malformed NDJSON and CSV lines come out as
+    UnreadableRecord; a malformed JSON array cannot be read past the bad
+    element, so it raises ValueError.
+    """
+    if fmt == 'json':
+        with open(path, encoding='utf-8') as fp:
+            yield from iter_json_array(fp)
+    else:
+        # Read as bytes so each line is decoded (and can fail) on its own
+        with open(path, 'rb') as fp:
+            yield from iter_csv(fp) if fmt == 'csv' else iter_ndjson(fp)
+
+
+_boolean = serializers.BooleanField()
+
+
+def parse_record(record):
+    """
+    Turn one input record into Review field values. Accepts plain objects and
+    Django fixture entries (as in data/4.json). Raises ValueError if invalid.
+    """
+    if isinstance(record, UnreadableRecord):
+        raise ValueError(record.error)
+    if not isinstance(record, dict):
+        raise ValueError('not an object')
+    if 'fields' in record:
+        if record.get('model', 'shops.review') != 'shops.review':
+            raise ValueError(f"not a review: {record.get('model')}")
+        record = record['fields']
+    try:
+        rating = int(record['rating'])
+        row = {
+            'shop_id': int(record['shop']),
+            'reviewer_id': int(record['reviewer']),
+            'rating': rating,
+            'description': record.get('description') or '',
+            'has_freefood': _boolean.to_internal_value(record.get('has_freefood') or False),
+        }
+    except (KeyError, TypeError, ValueError, serializers.ValidationError) as e:
+        raise ValueError(f'invalid review: {e}')
+    if not 1 <= rating <= 5:
+        raise ValueError(f'rating out of range: {rating}')
+
+    created_at = record.get('created_at')
+    if created_at:
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError(f"invalid created_at: {record['created_at']}")
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        row['created_at'] = created_at
+
+    # Rows exported with a detection result keep it
+    if record.get('score') not in (None, ''):
+        row['is_ai_generated'] = _boolean.to_internal_value(record.get('is_ai_generated') or False)
+        row['score'] = Decimal(str(round(float(record['score']), 4)))
+    return row
+
+
+class ReviewImporter:
+    """
+    Streams reviews from a JSON array, NDJSON or CSV file into the reviews
+    table in chunks. Each chunk is inserted with bulk_create in one
+    transaction together with the source's checkpoint, so a rerun after an
+    interruption skips exactly the rows already imported. Shop stats (total
+    and daily) and reviewer counters are rebuilt once at the end for the
+    shops and reviewers that received reviews, also when the import stops
+    early. The checkpoint records those shops and reviewers, so a resumed
+    run rebuilds the ones imported into before an interruption as well.
+
+    Rows without a detection result are run through the detector per chunk,
+    or queued for the detection worker when detection is disabled.
+    """
+
+    def __init__(self, path, fmt=None, source=None, chunk_size=500,
+                 detect=True, detect_batch_size=16, log=None):
+        self.path = path
+        self.fmt = fmt or guess_format(path)
+        self.source = source or path
+        self.chunk_size = chunk_size
+        self.detect = detect
+        self.detect_batch_size = detect_batch_size
+        self.log = log or (lambda message: None)
+        self.imported = self.skipped = 0
+        self.shop_ids = set()
+        self.reviewer_ids = set()
+
+    def run(self, restart=False):
+        checkpoint, _ = ReviewImportCheckpoint.objects.get_or_create(source=self.source)
+        if restart:
+            checkpoint.rows_done, checkpoint.completed = 0, False
+            checkpoint.shop_ids, checkpoint.reviewer_ids = [], []
+            checkpoint.save()
+        elif checkpoint.completed:
+            self.log(f'{self.source} was already imported (use --restart to import it again)')
+            return checkpoint
+        if checkpoint.rows_done:
+            self.log(f'Resuming after {checkpoint.rows_done} rows')
+        self.shop_ids = set(checkpoint.shop_ids)
+        self.reviewer_ids = set(checkpoint.reviewer_ids)
+
+        started = time.monotonic()
+        try:
+            self.import_records(checkpoint, started)
+        finally:
+            # Also when the import stops early, for the chunks committed so far
+            self.rebuild_derived()
+        checkpoint.completed = True
+        checkpoint.save(update_fields=['completed', 'updated_at'])
+        self.log_progress(started)
+        return checkpoint
+
+    def import_records(self, checkpoint, started):
+        position = 0
+        chunk = []
+        try:
+            for record in iter_records(self.path, self.fmt):
+                position += 1
+                if position <= checkpoint.rows_done:
+                    continue
+                chunk.append((position, record))
+                if len(chunk) >= self.chunk_size:
+                    full, chunk = chunk, []
+                    self.import_chunk(full, checkpoint)
+                    self.log_progress(started)
+        except ValueError:
+            # A malformed JSON array cannot be read past the bad element, but
+            # the rows read before it are still imported
+            if chunk:
+                self.import_chunk(chunk, checkpoint)
+            raise
+        if chunk:
+            self.import_chunk(chunk, checkpoint)
+
+    def rebuild_derived(self):
+        if not self.shop_ids:
+            return
+        shop_ids, reviewer_ids = sorted(self.shop_ids), sorted(self.reviewer_ids)
+        # The shop_stats consumer may be recounting the same shops
+        with consumer_lock('shop_stats'):
+            rebuild_shop_stats(shop_ids)
+            rebuild_daily_stats(shop_ids)
+        recount_reviewers(reviewer_ids)
+        cache.delete_many([review_summary_key(shop_id) for shop_id in shop_ids])
+        invalidate_dashboards(
+            vendor_ids=Shop.objects.filter(shop_id__in=shop_ids).values_list('vendor_id', flat=True),
+            reviewer_ids=reviewer_ids)
+
+    def log_progress(self, started):
+        elapsed = time.monotonic() - started
+        rate = self.imported / elapsed if elapsed else 0
+        self.log(f'{self.imported} imported, {self.skipped} skipped, '
+                 f'{elapsed:.1f}s ({rate:.0f} rows/s)')
+
+    def skip(self, message):
+        self.skipped += 1
+        if self.skipped <= MAX_SKIP_MESSAGES:
+            self.log(message)
+        elif self.skipped == MAX_SKIP_MESSAGES + 1:
+            self.log('Further skipped rows are only counted')
+
+    def import_chunk(self, chunk, checkpoint):
+        rows = []
+        for position, record in chunk:
+            try:
+                rows.append(parse_record(record))
+            except ValueError as e:
+                self.skip(f'Row {position} skipped: {e}')
+        rows = self.drop_unknown_and_duplicates(rows)
+
+        undetected = [row for row in rows if 'score' not in row]
+        if undetected and self.detect:
+            # Imported lazily: ml.ml pulls in transformers and nltk, which
+            # --skip-detection runs do not need
+            from ml.ml import detect_ai_generated
+            results = detect_ai_generated(
+                [row['description'] for row in undetected], batch_size=self.detect_batch_size)
+            for row, (is_ai_generated, score) in zip(undetected, results):
+                if is_ai_generated is None:
+                    row['detection_status'] = Review.DetectionStatus.FAILED
+                    continue
+                row['is_ai_generated'] = is_ai_generated
+                row['score'] = Decimal(str(round(score, 4)))
+        elif undetected:
+            # Left to the detection worker
+            for row in undetected:
+                row['detection_status'] = Review.DetectionStatus.PENDING
+
+        shop_ids = self.shop_ids | {row['shop_id'] for row in rows}
+        reviewer_ids = self.reviewer_ids | {row['reviewer_id'] for row in rows}
+        update_fields = ['rows_done', 'updated_at']
+        if shop_ids != self.shop_ids or reviewer_ids != self.reviewer_ids:
+            checkpoint.shop_ids, checkpoint.reviewer_ids = sorted(shop_ids), sorted(reviewer_ids)
+            update_fields += ['shop_ids', 'reviewer_ids']
+
+        with transaction.atomic():
+            reviews = Review.objects.bulk_create([Review(**row) for row in rows])
+            DetectionJob.objects.bulk_create([
+                DetectionJob(review=review) for review in reviews
+                if review.detection_status == Review.DetectionStatus.PENDING
+            ])
+            checkpoint.rows_done = chunk[-1][0]
+            checkpoint.save(update_fields=update_fields)
+        self.imported += len(rows)
+        self.shop_ids, self.reviewer_ids = shop_ids, reviewer_ids
+
+    def drop_unknown_and_duplicates(self, rows):
+        """
+        Skip rows pointing at missing shops/reviewers, and reviewers who have
+        already reviewed the shop (in the table or earlier in this chunk).
+        """
+        shop_ids = {row['shop_id'] for row in rows}
+        reviewer_ids = {row['reviewer_id'] for row in rows}
+        known_shops = set(Shop.objects.filter(shop_id__in=shop_ids).values_list('shop_id', flat=True))
+        known_reviewers = set(Reviewer.objects.filter(
+            reviewer_id__in=reviewer_ids).values_list('reviewer_id', flat=True))
+        seen = set(Review.objects.filter(shop_id__in=shop_ids, reviewer_id__in=reviewer_ids)
+                   .values_list('shop_id', 'reviewer_id'))
+
+        kept = []
+        for row in rows:
+            pair = (row['shop_id'], row['reviewer_id'])
+            if row['shop_id'] not in known_shops or row['reviewer_id'] not in known_reviewers:
+                self.skip(f'Review of shop {pair[0]} by reviewer {pair[1]} skipped: unknown shop or reviewer')
+            elif pair in seen:
+                self.skip(f'Review of shop {pair[0]} by reviewer {pair[1]} skipped: already reviewed')
+            else:
+                seen.add(pair)
+                kept.append(row)
+        return kept
@@ -0,0 +1,41 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from shops.imports import FORMATS, ReviewImporter
+
+
+class Command(BaseCommand):
+    help = 'Stream reviews from a JSON array, NDJSON or CSV file into the database (resumable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--source',
+                            help='Checkpoint name to resume under (default: the absolute path)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--detect-batch-size', type=int, default=16)
+        parser.add_argument('--skip-detection', action='store_true',
+                            help='Queue rows without a score for the detection worker instead of detecting inline')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint and import from the first row')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.isfile(path):
+            raise CommandError(f'No such file: {path}')
+
+        importer = ReviewImporter(
+            path,
+            fmt=options['format'],
+            source=options['source'],
+            chunk_size=options['chunk_size'],
+            detect=not options['skip_detection'],
+            detect_batch_size=options['detect_batch_size'],
+            log=self.stdout.write,
+        )
+        try:
+            importer.run(restart=options['restart'])
+        except ValueError as e:
+            raise CommandError(f'Import stopped: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.imported} review(s), skipped {importer.skipped}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from shops.reviewers import promote_reviewers
+
+
+class Command(BaseCommand):
+    help = 'Recompute every reviewer level from their review and like counters (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Reviewers updated per statement')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recount the counters from the reviews table first')
+
+    def handle(self, *args, **options):
+        changed = promote_reviewers(
+            chunk_size=options['chunk_size'], recount=options['recount'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Reviewer level changed for {changed} reviewer(s)'))
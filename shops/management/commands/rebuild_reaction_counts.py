@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from shops.reactions import remove_duplicate_reactions, rebuild_reaction_counts
+
+
+class Command(BaseCommand):
+    help = 'Remove duplicate likes and rebuild the like/dislike counters on reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('review_ids', nargs='*', type=int,
+                            help='Only rebuild these reviews (default: all reviews)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        removed = remove_duplicate_reactions()
+        if removed:
+            self.stdout.write(f'Removed {removed} duplicate like(s)')
+        review_ids = options['review_ids'] or None
+        count = rebuild_reaction_counts(review_ids, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt like counts for {count} review(s)'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from shops.search import full_text_supported, refresh_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored full-text search vectors for shops'
+
+    def add_arguments(self, parser):
+        parser.add_argument('shop_ids', nargs='*', type=int,
+                            help='Only refresh these shops (default: all shops)')
+
+    def handle(self, *args, **options):
+        if not full_text_supported():
+            self.stdout.write(
+                'Full-text search needs PostgreSQL, nothing to rebuild')
+            return
+        count = refresh_search_vectors(options['shop_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed search vectors for {count} shop(s)'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from shops.aggregates import rebuild_shop_stats
+from shops.outbox import consumer_lock
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-shop review aggregates from the reviews table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('shop_ids', nargs='*', type=int,
+                            help='Only rebuild these shops (default: all shops)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        shop_ids = options['shop_ids'] or None
+        # In one transaction, holding off the shop_stats consumer
+        with consumer_lock('shop_stats'):
+            count = rebuild_shop_stats(shop_ids, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt review stats for {count} shop(s)'))
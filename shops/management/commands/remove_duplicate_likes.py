@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from shops.models import Likes
+from shops.reactions import remove_duplicate_reactions
+
+
+class Command(BaseCommand):
+    help = (
+        'Keep only the newest like/dislike per reviewer and review. Run before '
+        'migrate on databases created before likes were made unique, which '
+        'the unique constraint would otherwise fail on'
+    )
+
+    def handle(self, *args, **options):
+        if Likes._meta.db_table not in connection.introspection.table_names():
+            self.stdout.write('No likes table yet, nothing to remove')
+            return
+        removed = remove_duplicate_reactions()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} duplicate like(s)'))
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from shops.detection import DEFAULT_LEASE_SECONDS, claim_jobs, process_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run AI-generated detection for reviews queued by the review endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=16)
+        parser.add_argument('--lease', type=int, default=DEFAULT_LEASE_SECONDS,
+                            help='Seconds a claimed batch is reserved for this worker')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            jobs = claim_jobs(batch_size, lease_seconds=options['lease'])
+            if not jobs:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            done, failed = process_jobs(
+                jobs, batch_size=batch_size,
+                on_error=lambda e: self.stderr.write(f'Detection failed: {e}'))
+            self.stdout.write(f'{len(jobs)} claimed, {done} detected, {failed} failed')
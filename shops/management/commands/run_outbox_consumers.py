@@ -0,0 +1,54 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from shops.outbox import consumer_names, process_batch, prune_events
+
+
+class Command(BaseCommand):
+    help = 'Feed outbox events (review, like, reply, shop and favourite changes) to the registered consumers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append', dest='consumers',
+                            help='Only run this consumer (repeatable; default: all)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep once every consumer has caught up')
+        parser.add_argument('--prune-days', type=int,
+                            help='Delete events processed by every consumer and older than this many days')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once every consumer has caught up instead of polling')
+
+    def handle(self, *args, **options):
+        names = options['consumers'] or consumer_names()
+        unknown = set(names) - set(consumer_names())
+        if unknown:
+            raise CommandError(
+                f"Unknown consumer(s): {', '.join(sorted(unknown))} "
+                f"(registered: {', '.join(consumer_names())})")
+
+        while True:
+            read = 0
+            for name in names:
+                try:
+                    count = process_batch(
+                        name, batch_size=options['batch_size'],
+                        on_quarantine=lambda event, error, name=name: self.stderr.write(
+                            f'{name} quarantined {event.event_type} #{event.id}: {error}'))
+                except Exception as e:
+                    # The checkpoint did not move; the batch is retried on
+                    # the next pass, or split up and its failing events
+                    # quarantined once it has failed OUTBOX_MAX_ATTEMPTS times
+                    self.stderr.write(f'{name} failed: {e}')
+                    continue
+                if count:
+                    self.stdout.write(f'{name}: {count} event(s)')
+                read += count
+            if read:
+                continue
+            if options['prune_days'] is not None:
+                pruned = prune_events(timedelta(days=options['prune_days']))
+                if pruned:
+                    self.stdout.write(f'Pruned {pruned} event(s)')
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Coalesce
 from users.models import Vendor, Reviewer
 from django.utils import timezone
 
@@ -11,6 +14,25 @@ class Region(models.Model):
         return f"Region {self.region_id}: {self.region_name}"
 
 
+class ShopQuerySet(models.QuerySet):
+    def with_listing_stats(self):
+        """
+        Annotate everything ShopSerializer reads per shop (review_count,
+        average_rating, has_freefood) from the stats row and prefetch the
+        categories, so a page of shops serializes in a fixed number of queries.
+        """
+        return self.annotate(
+            review_count=Coalesce(
+                models.F('review_stats__review_count'), models.Value(0)),
+            average_rating=models.F('review_stats__average_rating'),
+            has_freefood=models.Case(
+                models.When(review_stats__freefood_count__gt=0,
+                            then=models.Value(True)),
+                default=models.Value(False),
+            ),
+        ).prefetch_related('shop_categories')
+
+
 class Shop(models.Model):
     shop_id = models.AutoField(primary_key=True)
     vendor = models.ForeignKey(
@@ -38,6 +60,20 @@ class Shop(models.Model):
     postal_code = models.CharField(max_length=20)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True, null=True)
+    # Maintained by shops.search.refresh_search_vectors
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+
+    objects = ShopQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='shop_search_vector_idx'),
+            # Vendor dashboards and "my shops" lists
+            models.Index(fields=['vendor', 'claim_status'],
+                         name='shop_vendor_claim_idx'),
+            models.Index(fields=['latitude', 'longitude'],
+                         name='shop_lat_lng_idx'),
+        ]
 
     def __str__(self):
         return f"Shop {self.shop_id} (Vendor {self.vendor.vendor_id if self.vendor else 'None'}, Region {self.region.region_id})"
@@ -82,7 +118,21 @@ class Dish(models.Model):
         return f"Dish {self.dish_id} (Shop {self.shop.shop_id}): {self.dish_name}"
 
 
+class ReviewQuerySet(models.QuerySet):
+    def with_listing_data(self):
+        """
+        Join the reviewer's user, which ReviewSerializer reads per review, so
+        a page of reviews serializes without per-review queries.
+        """
+        return self.select_related('reviewer__user')
+
+
 class Review(models.Model):
+    class DetectionStatus(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
     review_id = models.AutoField(primary_key=True)
     shop = models.ForeignKey(
         Shop, on_delete=models.CASCADE, related_name='reviews')
@@ -93,13 +143,197 @@ class Review(models.Model):
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
     is_ai_generated = models.BooleanField(default=False)
-    score = models.DecimalField(max_digits=5, decimal_places=4, default=100.00)
+    # Detector confidence; empty until detection has run (see shops.detection)
+    score = models.DecimalField(
+        max_digits=5, decimal_places=4, blank=True, null=True)
+    detection_status = models.CharField(
+        max_length=10, choices=DetectionStatus.choices, default=DetectionStatus.DONE
+    )
     updated_at = models.DateTimeField(auto_now=True, null=True)
+    # Maintained by shops.reactions alongside the Likes rows
+    like_count = models.PositiveIntegerField(default=0)
+    dislike_count = models.PositiveIntegerField(default=0)
+    # Wilson lower bound of the like ratio, see shops.reactions
+    helpfulness = models.FloatField(default=0)
+
+    objects = ReviewQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Default review ordering of a shop ("most helpful")
+            models.Index(fields=['shop', '-helpfulness', '-created_at'],
+                         name='review_shop_helpful_idx'),
+            # Newest-first review lists (shop pages, vendor dashboards)
+            models.Index(fields=['shop', '-created_at'],
+                         name='review_shop_created_idx'),
+            # Rating filters and sorts within a shop
+            models.Index(fields=['shop', 'rating'],
+                         name='review_shop_rating_idx'),
+            # A reviewer's own reviews, newest first
+            models.Index(fields=['reviewer', '-created_at'],
+                         name='review_reviewer_created_idx'),
+        ]
 
     def __str__(self):
         return f"Review {self.review_id} for Shop {self.shop.shop_id} by Reviewer {self.reviewer.reviewer_id}"
 
 
+class ShopReviewStats(models.Model):
+    """
+    Per-shop review aggregates, kept current by shops.aggregates so listings
+    never have to count or average the shop's reviews on read.
+    """
+    shop = models.OneToOneField(
+        Shop, on_delete=models.CASCADE, primary_key=True, related_name='review_stats')
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(blank=True, null=True)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    freefood_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def has_freefood(self):
+        return self.freefood_count > 0
+
+    def rating_distribution(self):
+        return {star: getattr(self, f'rating_{star}_count') for star in range(5, 0, -1)}
+
+    def __str__(self):
+        return f"Review stats for Shop {self.shop_id}"
+
+
+class ShopDailyReviewStats(models.Model):
+    """
+    Per-shop, per-day review aggregates (days of Review.created_at), kept
+    current by shops.aggregates so any date window can be answered by summing
+    a few rows instead of scanning reviews.
+    """
+    shop = models.ForeignKey(
+        Shop, on_delete=models.CASCADE, related_name='daily_review_stats')
+    day = models.DateField()
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    ai_generated_count = models.PositiveIntegerField(default=0)
+    freefood_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'day'], name='shop_daily_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"Review stats for Shop {self.shop_id} on {self.day}"
+
+
+class DetectionJob(models.Model):
+    """
+    Review waiting for AI-generated detection. Drained in micro-batches by
+    `manage.py run_detection_worker`; see shops.detection.
+    """
+    review = models.OneToOneField(
+        Review, on_delete=models.CASCADE, primary_key=True, related_name='detection_job')
+    # Bumped whenever the review text changes, so a result computed for an
+    # older text is discarded
+    requested_at = models.DateTimeField(default=timezone.now)
+    # Jobs are claimed by pushing this into the future (a lease); a worker
+    # that dies mid-batch leaves them to be picked up again after it
+    available_at = models.DateTimeField(default=timezone.now, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Detection job for Review {self.review_id}"
+
+
+class ReviewImportCheckpoint(models.Model):
+    """
+    Progress of a `manage.py import_reviews` source, committed together with
+    each imported chunk so an interrupted import resumes where it stopped.
+    The shops and reviewers that received reviews are recorded with it, so
+    their stats can be rebuilt after an interruption.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    rows_done = models.PositiveIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    shop_ids = models.JSONField(default=list)
+    reviewer_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import of {self.source} ({self.rows_done} rows)"
+
+
+class OutboxEvent(models.Model):
+    """
+    Append-only record of a change to reviews, likes, replies, shops or
+    favourites, written in the same transaction as the change. Read in
+    (txid, id) order by the consumers of `manage.py run_outbox_consumers`;
+    see shops.outbox.
+    """
+    id = models.BigAutoField(primary_key=True)
+    # Id of the writing transaction (Postgres xid8), set by record_event
+    txid = models.BigIntegerField(default=0)
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['txid', 'id'], name='outbox_event_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id}"
+
+
+class OutboxCheckpoint(models.Model):
+    """
+    Position, as (last_txid, last_event_id), of the last outbox event a
+    consumer has processed.
+    """
+    consumer = models.CharField(max_length=100, unique=True)
+    last_txid = models.BigIntegerField(default=0)
+    last_event_id = models.BigIntegerField(default=0)
+    # Consecutive failed attempts at the next batch
+    failures = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer} at event {self.last_event_id}"
+
+
+class QuarantinedOutboxEvent(models.Model):
+    """
+    Copy of an outbox event a consumer kept failing on and skipped, with the
+    error, so it can be inspected (and replayed by hand) after the event
+    itself has been pruned.
+    """
+    consumer = models.CharField(max_length=100)
+    event_id = models.BigIntegerField()
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    error = models.TextField()
+    quarantined_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['consumer', 'event_id'], name='quarantined_event_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.event_id} quarantined by {self.consumer}"
+
+
 class Reply(models.Model):
     reply_id = models.AutoField(primary_key=True)
     vendor = models.ForeignKey(
@@ -121,6 +355,14 @@ class Likes(models.Model):
     likeORdislike = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        unique_together = ('reviewer', 'review')
+        indexes = [
+            # Like/dislike counts per review
+            models.Index(fields=['review', 'likeORdislike'],
+                         name='likes_review_value_idx'),
+        ]
+
 
 class Announcement(models.Model):
     announcement_id = models.AutoField(primary_key=True)
@@ -133,6 +375,12 @@ class Announcement(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop', '-created_at'],
+                         name='announcement_shop_created_idx'),
+        ]
+
 
 class Favourite(models.Model):
     reviewer = models.ForeignKey(
@@ -0,0 +1,195 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Func, Q
+from django.utils import timezone
+from .models import OutboxEvent, OutboxCheckpoint, QuarantinedOutboxEvent
+
+REVIEW_CREATED = 'review.created'
+REVIEW_UPDATED = 'review.updated'
+REVIEW_DELETED = 'review.deleted'
+REACTION_SET = 'reaction.set'
+REACTION_REMOVED = 'reaction.removed'
+REPLY_CREATED = 'reply.created'
+SHOP_CREATED = 'shop.created'
+SHOP_UPDATED = 'shop.updated'
+SHOP_DELETED = 'shop.deleted'
+FAVOURITE_ADDED = 'favourite.added'
+FAVOURITE_REMOVED = 'favourite.removed'
+
+REVIEW_EVENTS = (REVIEW_CREATED, REVIEW_UPDATED, REVIEW_DELETED)
+REACTION_EVENTS = (REACTION_SET, REACTION_REMOVED)
+
+Consumer = namedtuple('Consumer', ['name', 'event_types', 'handler'])
+
+_consumers = {}
+
+
+class CurrentTransactionId(Func):
+    template = 'pg_current_xact_id()::text::bigint'
+    output_field = BigIntegerField()
+
+
+class OldestRunningTransactionId(Func):
+    # Every transaction with a lower id has committed or rolled back
+    template = 'pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+    output_field = BigIntegerField()
+
+
+def record_event(event_type, **payload):
+    """
+    Append an event to the outbox. Must be called inside the transaction that
+    makes the change, so the event is committed if and only if the change is.
+    The payload must be JSON-serialisable.
+    """
+    if not connection.in_atomic_block:
+        raise RuntimeError(f'{event_type} must be recorded inside transaction.atomic()')
+    return OutboxEvent.objects.create(
+        event_type=event_type, payload=payload, txid=CurrentTransactionId())
+
+
+def review_payload(review):
+    return {
+        'review_id': review.review_id,
+        'shop_id': review.shop_id,
+        'reviewer_id': review.reviewer_id,
+        'rating': int(review.rating),
+    }
+
+
+def consumer(name, event_types=None):
+    """
+    Register `handler(events)` as the outbox consumer `name`. It is called
+    with batches of events (oldest first) of the given types, or of every
+    type if none are given. Events are delivered at least once, so handlers
+    must be idempotent.
+    """
+    def register(handler):
+        _consumers[name] = Consumer(
+            name, frozenset(event_types) if event_types else None, handler)
+        return handler
+    return register
+
+
+def consumer_names():
+    return sorted(_consumers)
+
+
+def _after(txid, event_id):
+    return Q(txid__gt=txid) | Q(txid=txid, id__gt=event_id)
+
+
+def _lock_checkpoint(name):
+    OutboxCheckpoint.objects.get_or_create(consumer=name)
+    return OutboxCheckpoint.objects.select_for_update().get(consumer=name)
+
+
+@contextmanager
+def consumer_lock(name):
+    """
+    Run the block in a transaction that holds consumer `name`'s checkpoint
+    lock, so the consumer cannot process a batch meanwhile. For rebuilding
+    data the consumer maintains without the two overwriting each other.
+    """
+    with transaction.atomic():
+        yield _lock_checkpoint(name)
+
+
+def max_attempts():
+    return getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def _run_handler(handler, events):
+    # In a savepoint, so a failure undoes the handler's writes but not the
+    # caller's bookkeeping; returns the error, if any
+    try:
+        with transaction.atomic():
+            handler(events)
+    except Exception as e:
+        return e
+    return None
+
+
+def process_batch(name, batch_size=500, on_quarantine=None):
+    """
+    Hand the consumer its next batch of events and advance its checkpoint.
+    Returns the number of events read (0 once it has caught up).
+
+    Event ids are taken when an event is written but become visible when its
+    transaction commits, so they do not arrive in id order. Events are read
+    in (transaction id, id) order instead, and only from transactions older
+    than the oldest one still running: any event that commits later belongs
+    to a transaction at least that new, so it sorts after the checkpoint.
+    A transaction left open therefore holds back (but never loses) the
+    events written after it started.
+
+    The checkpoint row stays locked while the handler runs, so two workers
+    never process the same consumer at once. A handler error leaves the
+    checkpoint where it was, records the failure and re-raises, so the batch
+    is read again. Once a batch has failed OUTBOX_MAX_ATTEMPTS times in a
+    row, its events are handled one at a time instead: the ones that still
+    fail are copied to QuarantinedOutboxEvent (and passed to
+    `on_quarantine(event, error)`) and skipped, so one bad event cannot hold
+    up every event behind it.
+    """
+    registered = _consumers[name]
+    with transaction.atomic():
+        checkpoint = _lock_checkpoint(name)
+        events = list(
+            OutboxEvent.objects
+            .filter(_after(checkpoint.last_txid, checkpoint.last_event_id),
+                    txid__lt=OldestRunningTransactionId())
+            .order_by('txid', 'id')[:batch_size]
+        )
+        if not events:
+            return 0
+        if registered.event_types is not None:
+            wanted = [event for event in events if event.event_type in registered.event_types]
+        else:
+            wanted = events
+        error = _run_handler(registered.handler, wanted) if wanted else None
+        if error is not None and checkpoint.failures + 1 < max_attempts():
+            checkpoint.failures += 1
+            checkpoint.last_error = f'{type(error).__name__}: {error}'
+            checkpoint.save(update_fields=['failures', 'last_error', 'updated_at'])
+        else:
+            if error is not None:
+                _quarantine_failing(name, registered.handler, wanted, on_quarantine)
+            checkpoint.last_txid, checkpoint.last_event_id = events[-1].txid, events[-1].id
+            checkpoint.failures, checkpoint.last_error = 0, ''
+            checkpoint.save(update_fields=[
+                'last_txid', 'last_event_id', 'failures', 'last_error', 'updated_at'])
+            error = None
+    if error is not None:
+        raise error
+    return len(events)
+
+
+def _quarantine_failing(name, handler, events, on_quarantine):
+    for event in events:
+        error = _run_handler(handler, [event])
+        if error is None:
+            continue
+        QuarantinedOutboxEvent.objects.get_or_create(
+            consumer=name, event_id=event.id,
+            defaults={'event_type': event.event_type, 'payload': event.payload,
+                      'error': f'{type(error).__name__}: {error}'})
+        if on_quarantine:
+            on_quarantine(event, error)
+
+
+def prune_events(older_than):
+    """
+    Delete events older than `older_than` (a timedelta) that every registered
+    consumer has already processed. Returns the number deleted.
+    """
+    if not _consumers:
+        return 0
+    checkpoints = {consumer: (txid, event_id) for consumer, txid, event_id in
+                   OutboxCheckpoint.objects.filter(consumer__in=_consumers).values_list(
+                       'consumer', 'last_txid', 'last_event_id')}
+    processed = min(checkpoints.get(name, (0, 0)) for name in _consumers)
+    deleted, _ = OutboxEvent.objects.exclude(_after(*processed)).filter(
+        created_at__lt=timezone.now() - older_than).delete()
+    return deleted
@@ -0,0 +1,141 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def wants_cursor_pagination(request):
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or 'cursor' in params
+
+
+def _encode_value(value):
+    # Unlike DjangoJSONEncoder, keep full microseconds so seeks compare exactly
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f'Cannot encode {type(value).__name__} in a cursor')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in cursor pagination that seeks on the queryset's ordering plus the
+    primary key instead of using OFFSET, and skips COUNT(*) unless the client
+    passes count=true.
+
+    Orderings must be plain field or annotation names that are also
+    attributes of the returned objects, and must not be nullable (annotate a
+    Coalesce for nullable sort keys).
+
+    Links point at the requested URL, or at `base_url` when the page is
+    embedded in another endpoint's response and the listing lives elsewhere.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, page_size=20, base_url=None):
+        self.page_size = page_size
+        self.base_url = base_url
+
+    def get_ordering(self, queryset):
+        ordering = []
+        for field in queryset.query.order_by:
+            if not isinstance(field, str):
+                raise ValueError(
+                    'Keyset pagination only supports field name orderings')
+            ordering.append((field.lstrip('-'), field.startswith('-')))
+
+        pk_name = queryset.model._meta.pk.name
+        ordering = [(f, desc) for f, desc in ordering if f not in (pk_name, 'pk')]
+        pk_desc = ordering[0][1] if ordering else False
+        return ordering + [(pk_name, pk_desc)]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+
+        if cursor:
+            queryset = queryset.filter(self._seek(cursor['v'], reverse))
+        queryset = queryset.order_by(*[
+            f'-{field}' if desc != reverse else field for field, desc in self.ordering
+        ])
+
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = page
+        return page
+
+    def _seek(self, values, reverse):
+        # (a, b, pk) > (va, vb, vpk) expanded as
+        # a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND pk > vpk)
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        seek, equal = Q(), Q()
+        for (field, desc), value in zip(self.ordering, values):
+            lookup = 'lt' if desc != reverse else 'gt'
+            seek |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return seek
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(cursor.get('v'), list):
+                raise ValueError
+            return cursor
+        except (TypeError, ValueError, AttributeError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        values = [getattr(obj, field) for field, _ in self.ordering]
+        payload = json.dumps({'v': values, 'r': reverse},
+                             default=_encode_value, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri(self.base_url)
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(payload)
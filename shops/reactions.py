@@ -0,0 +1,176 @@
+from django.db import connection, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Q, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Sqrt
+from .models import Review, Likes
+from .aggregates import touch_shop_stats
+from .cache import invalidate_dashboards
+from .reviewers import apply_likes_received
+from .outbox import REACTION_SET, REACTION_REMOVED, record_event
+
+# Review counter for each reaction value
+_COUNTER_FIELD = {True: 'like_count', False: 'dislike_count'}
+
+# z for a 95% confidence interval
+WILSON_Z = 1.96
+
+
+def helpfulness_expression(likes, dislikes):
+    """
+    Lower bound of the Wilson score interval for the share of likes, as a
+    database expression over the like and dislike counts. Unlike the plain
+    ratio, a review with 40 likes out of 50 outranks one with 1 out of 1.
+    """
+    z2 = WILSON_Z * WILSON_Z
+    # NULL without any reactions, which is then scored 0
+    n = NullIf(Cast(likes + dislikes, FloatField()), Value(0.0))
+    p = Cast(likes, FloatField()) / n
+    bound = ExpressionWrapper(
+        (p + Value(z2 / 2) / n
+         - Value(WILSON_Z) * Sqrt((p * (Value(1.0) - p) + Value(z2 / 4) / n) / n))
+        / (Value(1.0) + Value(z2) / n),
+        output_field=FloatField(),
+    )
+    return Coalesce(bound, Value(0.0))
+
+
+def _apply_counters(review_id, old, new):
+    if old == new:
+        return
+    delta = {'like_count': 0, 'dislike_count': 0}
+    if old is not None:
+        delta[_COUNTER_FIELD[old]] -= 1
+    if new is not None:
+        delta[_COUNTER_FIELD[new]] += 1
+    likes = F('like_count') + delta['like_count']
+    dislikes = F('dislike_count') + delta['dislike_count']
+    Review.objects.filter(review_id=review_id).update(
+        like_count=likes,
+        dislike_count=dislikes,
+        helpfulness=helpfulness_expression(likes, dislikes),
+    )
+    if delta['like_count']:
+        apply_likes_received(review_id, delta['like_count'])
+    # Reactions are part of the shop's review listing (and its ETag), and of
+    # the review author's dashboard
+    touch_shop_stats(review_id=review_id)
+    invalidate_dashboards(reviewer_ids=Review.objects.filter(
+        review_id=review_id).values_list('reviewer_id', flat=True))
+
+
+def _upsert_postgresql(reviewer_id, review_id, value, created_at):
+    """
+    Single-statement upsert. Returns (like_id, created_at, previous value), or
+    None when the row already held `value` and was left untouched.
+    """
+    qn = connection.ops.quote_name
+    table = qn(Likes._meta.db_table)
+    value_column = qn(Likes._meta.get_field('likeORdislike').column)
+    sql = f'''
+        INSERT INTO {table} ("reviewer_id", "review_id", {value_column}, "created_at")
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT ("reviewer_id", "review_id") DO UPDATE
+            SET {value_column} = EXCLUDED.{value_column}
+            WHERE {table}.{value_column} IS DISTINCT FROM EXCLUDED.{value_column}
+        RETURNING "id", "created_at", (xmax = 0) AS inserted
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [reviewer_id, review_id, value, created_at])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    like_id, created_at, inserted = row
+    # A conflicting row is only updated when it held the other value
+    return like_id, created_at, None if inserted else not value
+
+
+def set_reaction(reviewer, review_id, value):
+    """
+    Like (True) or dislike (False) a review, replacing any earlier reaction
+    by the same reviewer, and keep the review's counters in step.
+    Returns (like, created).
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            result = _upsert_postgresql(
+                reviewer.pk, review_id, value, Likes._meta.get_field('created_at').get_default())
+            if result is None:
+                return Likes.objects.get(reviewer=reviewer, review_id=review_id), False
+            like_id, created_at, previous = result
+            like = Likes(id=like_id, reviewer=reviewer, review_id=review_id,
+                         likeORdislike=value, created_at=created_at)
+            created = previous is None
+        else:
+            like, created = Likes.objects.select_for_update().get_or_create(
+                reviewer=reviewer, review_id=review_id, defaults={'likeORdislike': value})
+            previous = None if created else like.likeORdislike
+            if previous is not None and previous != value:
+                like.likeORdislike = value
+                like.save(update_fields=['likeORdislike'])
+
+        _apply_counters(review_id, previous, value)
+        if previous != value:
+            record_event(REACTION_SET, review_id=int(review_id), reviewer_id=reviewer.pk,
+                         value=value, previous=previous)
+    return like, created
+
+
+def remove_reaction(reviewer, review_id):
+    """
+    Remove the reviewer's reaction to a review. Returns False if there was none.
+    """
+    with transaction.atomic():
+        like = Likes.objects.select_for_update().filter(
+            reviewer=reviewer, review_id=review_id).first()
+        if like is None:
+            return False
+        like.delete()
+        _apply_counters(review_id, like.likeORdislike, None)
+        record_event(REACTION_REMOVED, review_id=int(review_id), reviewer_id=reviewer.pk,
+                     previous=like.likeORdislike)
+    return True
+
+
+def remove_duplicate_reactions():
+    """
+    Keep only the newest reaction per (reviewer, review). Duplicates could be
+    created by concurrent requests before the pair was made unique.
+    """
+    duplicates = Likes.objects.values('reviewer_id', 'review_id').annotate(
+        newest=Max('id'), rows=Count('id')).filter(rows__gt=1)
+    removed = 0
+    for row in list(duplicates):
+        deleted, _ = Likes.objects.filter(
+            reviewer_id=row['reviewer_id'], review_id=row['review_id']
+        ).exclude(id=row['newest']).delete()
+        removed += deleted
+    return removed
+
+
+def rebuild_reaction_counts(review_ids=None, chunk_size=1000):
+    """
+    Recompute Review.like_count / dislike_count (and from them helpfulness)
+    from the Likes table, for the
+    given reviews or for every review. Returns the number of reviews processed.
+    """
+    reviews = Review.objects.order_by('review_id')
+    if review_ids is not None:
+        reviews = reviews.filter(review_id__in=review_ids)
+    all_ids = list(reviews.values_list('review_id', flat=True))
+
+    for start in range(0, len(all_ids), chunk_size):
+        chunk = all_ids[start:start + chunk_size]
+        rows = Likes.objects.filter(review_id__in=chunk).values('review_id').annotate(
+            likes=Count('id', filter=Q(likeORdislike=True)),
+            dislikes=Count('id', filter=Q(likeORdislike=False)),
+        ).order_by()
+        by_review = {row['review_id']: row for row in rows}
+        with transaction.atomic():
+            Review.objects.bulk_update([
+                Review(review_id=review_id,
+                       like_count=by_review.get(review_id, {}).get('likes', 0),
+                       dislike_count=by_review.get(review_id, {}).get('dislikes', 0))
+                for review_id in chunk
+            ], ['like_count', 'dislike_count'])
+            Review.objects.filter(review_id__in=chunk).update(
+                helpfulness=helpfulness_expression(F('like_count'), F('dislike_count')))
+    return len(all_ids)
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from users.models import Reviewer
+from .models import Review
+
+# Minimum (reviews written, likes received) for each level, highest first;
+# everyone else is bronze
+LEVEL_THRESHOLDS = [
+    (Reviewer.Level.PLATINUM, 50, 200),
+    (Reviewer.Level.GOLD, 20, 50),
+    (Reviewer.Level.SILVER, 5, 10),
+]
+
+
+def _adjust(field, delta):
+    # Clamped so counters that have drifted (or were never counted) cannot
+    # make a write fail; `promote_reviewers --recount` repairs them
+    return Greatest(F(field) + delta, 0)
+
+
+def apply_reviewer_review_change(reviewer_id, shop_id, sign, likes=0):
+    """
+    Fold one review create (sign=1) or delete (sign=-1) into the reviewer's
+    counters; `likes` is the like count of a deleted review, whose likes go
+    with it. Must be called after the review write itself.
+    """
+    updates = {'review_count': _adjust('review_count', sign)}
+    if likes:
+        updates['likes_received_count'] = _adjust('likes_received_count', sign * likes)
+    # A shop counts once, however many of its reviews the reviewer has
+    remaining = Review.objects.filter(reviewer_id=reviewer_id, shop_id=shop_id).count()
+    if remaining == (1 if sign > 0 else 0):
+        updates['shops_reviewed_count'] = _adjust('shops_reviewed_count', sign)
+    Reviewer.objects.filter(reviewer_id=reviewer_id).update(**updates)
+
+
+def apply_likes_received(review_id, delta):
+    """
+    Add `delta` likes to the counter of the review's author.
+    """
+    Reviewer.objects.filter(reviews=review_id).update(
+        likes_received_count=_adjust('likes_received_count', delta))
+
+
+def _recount_expressions():
+    reviews = Review.objects.filter(reviewer=OuterRef('pk')).order_by().values('reviewer')
+
+    def count(aggregate):
+        return Coalesce(Subquery(reviews.annotate(value=aggregate).values('value')), 0)
+
+    return {
+        'review_count': count(Count('review_id')),
+        'shops_reviewed_count': count(Count('shop', distinct=True)),
+        'likes_received_count': count(Sum('like_count')),
+    }
+
+
+def level_expression():
+    return Case(
+        *[When(review_count__gte=reviews, likes_received_count__gte=likes, then=Value(level))
+          for level, reviews, likes in LEVEL_THRESHOLDS],
+        default=Value(Reviewer.Level.BRONZE),
+    )
+
+
+def _chunks(reviewers, chunk_size):
+    """
+    Split the reviewers into querysets of up to `chunk_size` consecutive ids,
+    without loading the ids themselves.
+    """
+    last_id = 0
+    while True:
+        chunk = reviewers.filter(reviewer_id__gt=last_id)
+        upper = chunk.order_by('reviewer_id').values_list(
+            'reviewer_id', flat=True)[chunk_size - 1:chunk_size].first()
+        if upper is None:
+            yield chunk
+            return
+        yield chunk.filter(reviewer_id__lte=upper)
+        last_id = upper
+
+
+def recount_reviewers(reviewer_ids=None, chunk_size=10000):
+    """
+    Recompute the counters from the reviews table, for the given reviewers
+    or for every reviewer, one UPDATE per chunk.
+    """
+    reviewers = Reviewer.objects.all()
+    if reviewer_ids is not None:
+        reviewers = reviewers.filter(reviewer_id__in=reviewer_ids)
+    for chunk in _chunks(reviewers, chunk_size):
+        chunk.update(**_recount_expressions())
+
+
+def promote_reviewers(chunk_size=10000, recount=False):
+    """
+    Recompute every reviewer's level from their counters (recounting those
+    first if asked), one UPDATE per chunk that only touches reviewers whose
+    level changes. Returns the number of reviewers whose level changed.
+    """
+    level = level_expression()
+    changed = 0
+    for chunk in _chunks(Reviewer.objects.all(), chunk_size):
+        with transaction.atomic():
+            if recount:
+                chunk.update(**_recount_expressions())
+            changed += chunk.exclude(reviewer_level=level).update(reviewer_level=level)
+    return changed
@@ -0,0 +1,95 @@
+import re
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast
+from .models import Shop, ShopCategory, Dish
+from .cache import bump_namespace
+
+SEARCH_CONFIG = 'english'
+_TERM_RE = re.compile(r'\w+')
+
+
+def full_text_supported():
+    # The search vector and its GIN index only exist on Postgres; other
+    # backends (e.g. SQLite test runs) fall back to icontains matching.
+    return connection.vendor == 'postgresql'
+
+
+def _search_vector():
+    category_names = ShopCategory.objects.filter(shop=OuterRef('pk')).order_by().values(
+        'shop').annotate(names=StringAgg('category__category_name', ' ')).values('names')
+    dish_names = Dish.objects.filter(shop=OuterRef('pk')).order_by().values(
+        'shop').annotate(names=StringAgg('dish_name', ' ')).values('names')
+    return (
+        SearchVector('shop_name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(category_names), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(dish_names), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('shop_description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def refresh_search_vectors(shop_ids=None):
+    """
+    Recompute the stored search vector from the shop's name, description,
+    category names and dish names. shops.signals calls this whenever a
+    Shop, ShopCategory or Dish is saved or deleted.
+    """
+    if not full_text_supported():
+        return 0
+    shops = Shop.objects.all()
+    if shop_ids is not None:
+        shops = shops.filter(shop_id__in=shop_ids)
+    updated = shops.update(search_vector=_search_vector())
+    transaction.on_commit(lambda: bump_namespace('shops'))
+    return updated
+
+
+def search_shops(queryset, q):
+    """
+    Filter shops matching the search text. On Postgres every term is matched
+    as a prefix against the search vector and results are annotated with
+    `search_rank`; elsewhere this is a plain icontains match.
+    """
+    if not full_text_supported():
+        return queryset.filter(
+            Q(shop_name__icontains=q) |
+            Q(shop_description__icontains=q) |
+            Q(shop_categories__category__category_name__icontains=q) |
+            Q(dishes__dish_name__icontains=q)
+        ).distinct()
+
+    terms = _TERM_RE.findall(q)
+    if not terms:
+        return queryset.none()
+    query = SearchQuery(' & '.join(f'{term}:*' for term in terms),
+                        search_type='raw', config=SEARCH_CONFIG)
+    # ts_rank returns a float4; cast so the rank round-trips exactly through
+    # pagination cursors
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+
+
+def shop_facets(queryset):
+    """
+    Filter chip counts for a filtered shop queryset, in two grouped queries:
+    per region (with halal/vegetarian as conditional counts) and per category.
+    """
+    shop_ids = queryset.order_by().values('pk')
+    by_region = Shop.objects.filter(pk__in=shop_ids).values('region_id').annotate(
+        count=Count('pk'),
+        halal=Count('pk', filter=Q(is_halal=True)),
+        vegetarian=Count('pk', filter=Q(is_vegetarian=True)),
+    ).order_by()
+    by_category = ShopCategory.objects.filter(shop__in=shop_ids).values('category_id').annotate(
+        count=Count('shop', distinct=True)
+    ).order_by()
+
+    regions = list(by_region)
+    return {
+        'categories': {row['category_id']: row['count'] for row in by_category},
+        'regions': {row['region_id']: row['count'] for row in regions},
+        'is_halal': sum(row['halal'] for row in regions),
+        'is_vegetarian': sum(row['vegetarian'] for row in regions),
+    }
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Category, Region, Shop, Review, Reply, Likes, Favourite, Announcement
+from .models import Category, Region, Shop, Review, Reply, Likes, Favourite, Announcement, ShopReviewStats
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -22,26 +22,50 @@ class ShopSerializer(serializers.ModelSerializer):
     average_rating = serializers.SerializerMethodField()
     categories = serializers.SerializerMethodField()
     has_freefood = serializers.SerializerMethodField()
+    distance_m = serializers.SerializerMethodField()
 
     class Meta:
         model = Shop
-        fields = '__all__'
+        exclude = ['search_vector']
         read_only_fields = ['shop_id', 'created_at', 'updated_at']
 
+    # Listings should pass Shop.objects.with_listing_stats(), whose
+    # annotations are read directly; otherwise fall back to the stats row.
+    def _get_stats(self, obj):
+        try:
+            return obj.review_stats
+        except ShopReviewStats.DoesNotExist:
+            return None
+
     def get_review_count(self, obj):
-        return obj.reviews.count()
+        if hasattr(obj, 'review_count'):
+            return obj.review_count
+        stats = self._get_stats(obj)
+        return stats.review_count if stats else 0
 
     def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if not reviews.exists():
+        if hasattr(obj, 'average_rating'):
+            average = obj.average_rating
+        else:
+            stats = self._get_stats(obj)
+            average = stats.average_rating if stats else None
+        if average is None:
             return None
-        return "{:.2f}".format(round(sum([r.rating for r in reviews]) / reviews.count(), 2))
+        return "{:.2f}".format(round(average, 2))
 
     def get_categories(self, obj):
         return [sc.category_id for sc in obj.shop_categories.all()]
 
     def get_has_freefood(self, obj):
-        return any(review.has_freefood for review in obj.reviews.all())
+        if hasattr(obj, 'has_freefood'):
+            return obj.has_freefood
+        stats = self._get_stats(obj)
+        return stats.has_freefood if stats else False
+
+    def get_distance_m(self, obj):
+        # Only annotated when the search is filtered by lat/lng
+        distance = getattr(obj, 'distance_m', None)
+        return round(distance) if distance is not None else None
 
 
 class VendorDashboardSerializer(serializers.Serializer):
@@ -55,8 +79,6 @@ class VendorDashboardSerializer(serializers.Serializer):
 
 class ReviewSerializer(serializers.ModelSerializer):
     userReaction = serializers.SerializerMethodField()
-    like_count = serializers.SerializerMethodField()
-    dislike_count = serializers.SerializerMethodField()
     has_freefood = serializers.SerializerMethodField()
     profile_pic = serializers.CharField(
         source='reviewer.user.profile_pic', read_only=True)
@@ -67,9 +89,16 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = '__all__'
         read_only_fields = ['review_id', 'created_at', 'reviewer',
-                            'shop', 'userReaction', 'like_count', 'dislike_count']
+                            'shop', 'userReaction', 'like_count', 'dislike_count',
+                            'helpfulness', 'is_ai_generated', 'score', 'detection_status']
 
+    # Lists should pass Review.objects.with_listing_data() and the requesting
+    # reviewer's reactions as {review_id: likeORdislike} in the context
+    # (see shops.views.reviewer_reactions); single reviews fall back to
+    # querying the likes.
     def get_userReaction(self, obj):
+        if 'reactions' in self.context:
+            return self.context['reactions'].get(obj.pk)
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return None
@@ -81,18 +110,10 @@ class ReviewSerializer(serializers.ModelSerializer):
             return True if like.likeORdislike else False
         return None
 
-    def get_like_count(self, obj):
-        return obj.likes.filter(likeORdislike=True).count()
-
-    def get_dislike_count(self, obj):
-        return obj.likes.filter(likeORdislike=False).count()
-
     def get_has_freefood(self, obj):
         # Only include `has_freefood` if the current user is the reviewer
         request = self.context.get('request')
-        print(
-            f"Request user: {request.user}, Reviewer user: {obj.reviewer.user}")
-        if request and request.user.is_authenticated and obj.reviewer.user == request.user:
+        if request and request.user.is_authenticated and obj.reviewer.user_id == request.user.id:
             return obj.has_freefood
         return None  # Hide the field for other users
 
@@ -133,6 +154,11 @@ class ReplySerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ShopPageReviewSerializer(ReviewSerializer):
+    # Expects the replies to be prefetched
+    replies = ReplySerializer(many=True, read_only=True)
+
+
 class AnnouncementSerializer(serializers.ModelSerializer):
     class Meta:
         model = Announcement
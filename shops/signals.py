@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .autocomplete import shop_index, shop_payload, category_payload, SHOP, CATEGORY
+from .cache import bump_namespace, review_summary_key, invalidate_dashboards
+from .models import Shop, ShopCategory, Category, Dish, Review, Reply, Announcement
+from .search import refresh_search_vectors
+
+
+@receiver([post_save, post_delete], sender=Shop)
+@receiver([post_save, post_delete], sender=ShopCategory)
+def invalidate_shop_caches(sender, **kwargs):
+    bump_namespace('shops')
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review_caches(sender, instance, **kwargs):
+    bump_namespace('reviews')
+    cache.delete(review_summary_key(instance.shop_id))
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review_dashboards(sender, instance, **kwargs):
+    invalidate_dashboards(
+        vendor_ids=Shop.objects.filter(shop_id=instance.shop_id).values_list('vendor_id', flat=True),
+        reviewer_ids=[instance.reviewer_id])
+
+
+@receiver([post_save, post_delete], sender=Reply)
+def invalidate_reply_dashboards(sender, instance, **kwargs):
+    invalidate_dashboards(vendor_ids=[instance.vendor_id])
+
+
+@receiver([post_save, post_delete], sender=Shop)
+def invalidate_shop_dashboards(sender, instance, **kwargs):
+    invalidate_dashboards(vendor_ids=[instance.vendor_id])
+
+
+@receiver([post_save, post_delete], sender=ShopCategory)
+def invalidate_shop_category_dashboards(sender, instance, **kwargs):
+    invalidate_dashboards(
+        vendor_ids=Shop.objects.filter(shop_id=instance.shop_id).values_list('vendor_id', flat=True))
+
+
+@receiver(post_save, sender=Shop)
+def refresh_shop_search_vector(sender, instance, **kwargs):
+    # Saving a Shop instance writes back whatever search_vector it was loaded
+    # with, so always recompute it afterwards
+    refresh_search_vectors([instance.shop_id])
+
+
+@receiver([post_save, post_delete], sender=ShopCategory)
+@receiver([post_save, post_delete], sender=Dish)
+def refresh_related_search_vector(sender, instance, **kwargs):
+    refresh_search_vectors([instance.shop_id])
+
+
+@receiver([post_save, post_delete], sender=ShopCategory)
+def touch_shop(sender, instance, **kwargs):
+    # Categories are part of the shop's representation (and its ETag)
+    Shop.objects.filter(shop_id=instance.shop_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Announcement)
+def touch_shop_announcements(sender, instance, **kwargs):
+    # A deleted announcement leaves no updated_at behind for the public
+    # listing's Last-Modified
+    Shop.objects.filter(shop_id=instance.shop_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Shop)
+def update_shop_autocomplete(sender, instance, **kwargs):
+    payload = shop_payload(instance)
+    transaction.on_commit(lambda: shop_index.upsert(SHOP, payload['shop_id'], payload))
+
+
+@receiver(post_delete, sender=Shop)
+def remove_shop_autocomplete(sender, instance, **kwargs):
+    shop_id = instance.shop_id
+    transaction.on_commit(lambda: shop_index.remove(SHOP, shop_id))
+
+
+@receiver(post_save, sender=Category)
+def update_category_autocomplete(sender, instance, **kwargs):
+    payload = category_payload(instance)
+    transaction.on_commit(lambda: shop_index.upsert(
+        CATEGORY, payload['category_id'], payload))
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_autocomplete(sender, instance, **kwargs):
+    category_id = instance.category_id
+    transaction.on_commit(lambda: shop_index.remove(CATEGORY, category_id))
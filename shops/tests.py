@@ -0,0 +1,787 @@
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User, Vendor, Reviewer
+from .aggregates import rebuild_shop_stats, rebuild_daily_stats
+from .imports import ReviewImporter
+from .models import (Region, Category, Shop, ShopCategory, ShopReviewStats, ShopDailyReviewStats,
+                     Review, Reply, Likes, Announcement, Favourite, DetectionJob, ReviewImportCheckpoint,
+                     OutboxCheckpoint, QuarantinedOutboxEvent)
+from . import outbox
+from .outbox import process_batch
+from .reactions import rebuild_reaction_counts
+from .reviewers import promote_reviewers
+from .search import refresh_search_vectors
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+# Never the configured cache, which may be a Redis shared with a deployment
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                           'LOCATION': 'shops-tests'}}
+
+_SEQ_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+_NAME_WORDS = ['chicken', 'rice', 'noodle', 'laksa', 'prata', 'satay', 'kopi', 'bak',
+               'kut', 'teh', 'curry', 'fish', 'soup', 'duck', 'char', 'kway', 'teow',
+               'hokkien', 'mee', 'nasi', 'lemak', 'dumpling', 'bakery', 'kitchen']
+
+# Tables that grow with usage. Plans are made with sequential scans
+# disabled, so one still showing up on these tables means no index can
+# serve the query at any data volume, not just that the table is small.
+HOT_TABLES = [model._meta.db_table for model in (
+    Shop, Review, ShopDailyReviewStats, Likes, Reply, Announcement)]
+
+
+def make_user(username, role=User.Role.REVIEWER):
+    return User.objects.create_user(username, f'{username}@example.com', 'password', role=role)
+
+
+def make_reviewer(username):
+    return Reviewer.objects.create(user=make_user(username))
+
+
+def make_shop(name='Chicken Rice', vendor=None, **fields):
+    if vendor is None:
+        vendor = Vendor.objects.create(user=make_user(f'vendor-{name}', role=User.Role.VENDOR))
+    region, _ = Region.objects.get_or_create(region_name='Central')
+    return Shop.objects.create(shop_name=name, vendor=vendor, region=region,
+                               address_line1='1 Test Street', postal_code='000001', **fields)
+
+
+def make_review(shop, reviewer, rating=4, **fields):
+    return Review.objects.create(shop=shop, reviewer=reviewer, rating=rating,
+                                 description='tasty', score=0.5, **fields)
+
+
+def run_consumer(name):
+    while process_batch(name):
+        pass
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are only checked on Postgres')
+@override_settings(CACHES=NO_CACHE)
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the queries behind the hot list endpoints and fail if any of them
+    can only be answered by a sequential scan of a large table.
+    """
+    shop_count = 300
+    reviews_per_shop = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        now = timezone.now()
+        region = Region.objects.create(region_name='Plan check')
+        categories = Category.objects.bulk_create(
+            [Category(category_name=f'Plan check {i}') for i in range(10)])
+
+        def users(prefix, count, role):
+            return User.objects.bulk_create([
+                User(username=f'plancheck-{prefix}-{i}', email=f'plancheck-{prefix}-{i}@example.com',
+                     password='!', role=role)
+                for i in range(count)
+            ])
+
+        vendor_count = max(cls.shop_count // 20, 1)
+        vendors = Vendor.objects.bulk_create(
+            [Vendor(user=user) for user in users('vendor', vendor_count, User.Role.VENDOR)])
+        reviewers = Reviewer.objects.bulk_create(
+            [Reviewer(user=user) for user in users('reviewer', max(cls.reviews_per_shop * 20, 50), User.Role.REVIEWER)])
+
+        shops = Shop.objects.bulk_create([
+            Shop(shop_name=f'{rng.choice(_NAME_WORDS)} {rng.choice(_NAME_WORDS)} {i}',
+                 shop_description='Plan check shop',
+                 vendor=vendors[i % vendor_count], region=region, address_line1='-',
+                 postal_code='000000', latitude=1.25 + rng.random() * 0.2,
+                 longitude=103.6 + rng.random() * 0.4)
+            for i in range(cls.shop_count)
+        ])
+        ShopCategory.objects.bulk_create([
+            ShopCategory(shop=shop, category=category)
+            for shop in shops for category in rng.sample(categories, 2)
+        ])
+
+        reviews = Review.objects.bulk_create([
+            Review(shop=shop, reviewer=reviewer, rating=rng.randint(1, 5), description='tasty',
+                   score=0.5, created_at=now - timedelta(days=rng.randint(0, 365)))
+            for shop in shops for reviewer in rng.sample(reviewers, cls.reviews_per_shop)
+        ])
+        Likes.objects.bulk_create([
+            Likes(review=review, reviewer=reviewer, likeORdislike=rng.random() < 0.8)
+            for review in reviews for reviewer in rng.sample(reviewers, 2)
+        ], ignore_conflicts=True)
+        Reply.objects.bulk_create([
+            Reply(review=review, vendor=review.shop.vendor, reply_description='thanks')
+            for review in reviews if rng.random() < 0.5
+        ])
+        Announcement.objects.bulk_create([
+            Announcement(shop=shop, title='News', description='-',
+                         created_at=now - timedelta(days=i * 7))
+            for shop in shops for i in range(5)
+        ])
+        shop_ids = [shop.shop_id for shop in shops]
+        refresh_search_vectors(shop_ids)
+        rebuild_shop_stats(shop_ids)
+        rebuild_daily_stats(shop_ids)
+
+        cls.shop = shops[len(shops) // 2]
+        cls.vendor_user = cls.shop.vendor.user
+        cls.reviewer_user = reviewers[0].user
+
+        with connection.cursor() as cursor:
+            for table in HOT_TABLES:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def endpoints(self):
+        shop_id = self.shop.shop_id
+        reviewer, vendor = self.reviewer_user, self.vendor_user
+        return [
+            ('shop search (text)', '/api/shops/search/?q=laksa', None),
+            ('shop search (nearby)', '/api/shops/search/?lat=1.3&lng=103.8&radius_m=500&sort_by=distance', None),
+            ('shop detail', f'/api/shops/{shop_id}/', None),
+            ('shop page', f'/api/shops/{shop_id}/page/', reviewer),
+            ('shop reviews (most helpful)', f'/api/shops/{shop_id}/reviews/', reviewer),
+            ('shop reviews (newest)', f'/api/shops/{shop_id}/reviews/?sort=newest', reviewer),
+            ('shop reviews (highest rating)', f'/api/shops/{shop_id}/reviews/?sort=highest_rating', reviewer),
+            ('shop replies', f'/api/shops/{shop_id}/reply/', None),
+            ('shop announcements', f'/api/shops/{shop_id}/announcements/', None),
+            ('vendor dashboard', '/api/vendor/dashboard/', vendor),
+            ('vendor analytics (weekly, one shop)', f'/api/vendor/analytics/?interval=week&shop_ids={shop_id}', vendor),
+            ('vendor reviews', '/api/vendor/reviews/', vendor),
+            ('vendor reviews (one shop, unreplied)', f'/api/vendor/reviews/?shop_id={shop_id}&unreplied=true', vendor),
+            ('vendor shops', '/api/vendor/shops/', vendor),
+            ('reviewer dashboard', '/api/reviewer/dashboard/', reviewer),
+            ('reviewer reviews', '/api/reviewer/reviews/', reviewer),
+        ]
+
+    def test_hot_endpoints_use_indexes(self):
+        for name, url, user in self.endpoints():
+            with self.subTest(name):
+                client = APIClient()
+                client.force_authenticate(user)
+                with CaptureQueriesContext(connection) as ctx:
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+
+                with connection.cursor() as cursor:
+                    for query in ctx.captured_queries:
+                        sql = query['sql']
+                        if not sql.lstrip().upper().startswith('SELECT'):
+                            continue
+                        cursor.execute(f'EXPLAIN {sql}')
+                        plan = '\n'.join(row[0] for row in cursor.fetchall())
+                        scanned = sorted(set(_SEQ_SCAN_RE.findall(plan)) & set(HOT_TABLES))
+                        self.assertEqual(scanned, [], f'{sql}\n{plan}')
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ShopStatsTests(TransactionTestCase):
+    """
+    The shop_stats consumer keeps the stored review aggregates equal to a
+    count of the reviews. Outbox events only become readable once their
+    transaction has committed, hence TransactionTestCase.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.shop = make_shop()
+        self.reviewer = make_reviewer('alice')
+        self.client = APIClient()
+        self.client.force_authenticate(self.reviewer.user)
+        self.url = f'/api/shops/{self.shop.shop_id}/reviews/'
+
+    def stats(self):
+        return ShopReviewStats.objects.get(shop=self.shop)
+
+    def assertMatchesRebuild(self):
+        stored = ShopReviewStats.objects.filter(shop=self.shop).values().first()
+        rebuild_shop_stats([self.shop.shop_id])
+        rebuilt = ShopReviewStats.objects.filter(shop=self.shop).values().first()
+        stored.pop('updated_at'), rebuilt.pop('updated_at')
+        self.assertEqual(stored, rebuilt)
+
+    def test_create_update_delete(self):
+        response = self.client.post(self.url, {'rating': 4, 'description': 'nice', 'has_freefood': True},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        review_id = response.data['review_id']
+        run_consumer('shop_stats')
+        stats = self.stats()
+        self.assertEqual((stats.review_count, stats.rating_sum, stats.average_rating), (1, 4, 4))
+        self.assertEqual((stats.rating_4_count, stats.freefood_count), (1, 1))
+
+        response = self.client.patch(f'{self.url}{review_id}/', {'rating': 2, 'description': 'meh'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        run_consumer('shop_stats')
+        stats = self.stats()
+        self.assertEqual((stats.review_count, stats.average_rating), (1, 2))
+        self.assertEqual((stats.rating_4_count, stats.rating_2_count, stats.freefood_count), (0, 1, 0))
+        self.assertMatchesRebuild()
+
+        response = self.client.delete(f'{self.url}{review_id}/')
+        self.assertEqual(response.status_code, 204)
+        run_consumer('shop_stats')
+        stats = self.stats()
+        self.assertEqual((stats.review_count, stats.rating_sum, stats.average_rating), (0, 0, None))
+        self.assertEqual(stats.rating_2_count, 0)
+
+    def test_delete_review_without_stats_row(self):
+        # Reviews written outside the API (e.g. loaddata) have no stats row
+        review = make_review(self.shop, self.reviewer, rating=5)
+        make_review(self.shop, make_reviewer('bob'), rating=3)
+        self.assertFalse(ShopReviewStats.objects.filter(shop=self.shop).exists())
+
+        response = self.client.delete(f'{self.url}{review.review_id}/')
+        self.assertEqual(response.status_code, 204)
+        run_consumer('shop_stats')
+        stats = self.stats()
+        self.assertEqual((stats.review_count, stats.rating_sum, stats.rating_3_count), (1, 3, 1))
+        self.assertEqual(stats.rating_5_count, 0)
+
+    def test_rebuild_with_events_pending(self):
+        self.client.post(self.url, {'rating': 5, 'description': 'great'}, format='json')
+        rebuild_shop_stats([self.shop.shop_id])
+        run_consumer('shop_stats')
+        self.assertEqual(self.stats().review_count, 1)
+        self.assertMatchesRebuild()
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class KeysetPaginationTests(TestCase):
+    """
+    Walking the cursors visits every row once on each sort, and the previous
+    link of a page leads back to the page before it.
+    """
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        vendor = Vendor.objects.create(user=make_user('vendor', role=User.Role.VENDOR))
+        now = timezone.now()
+        # Few distinct names, dates and ratings, so pages break inside ties
+        cls.shops = [
+            make_shop(f'Chicken Rice {i % 4}', vendor=vendor, latitude=1.30 + i * 0.0001,
+                      longitude=103.8, created_at=now - timedelta(days=i % 3))
+            for i in range(40)
+        ]
+        cls.reviewers = [make_reviewer(f'reviewer-{i}') for i in range(25)]
+        for i, reviewer in enumerate(cls.reviewers):
+            make_review(cls.shops[i], reviewer, rating=i % 5 + 1)
+            make_review(cls.shops[0] if i else cls.shops[1], reviewer, rating=i % 5 + 1,
+                        like_count=i % 3, dislike_count=i % 2, created_at=now - timedelta(hours=i % 4))
+            Favourite.objects.create(reviewer=cls.reviewers[0], shop=cls.shops[i])
+        rebuild_shop_stats()
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url, user=None):
+        self.client.force_authenticate(user)
+        key = 'review_id' if '/reviews/' in url else 'shop_id'
+        pages = []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append([row[key] for row in response.data['results']])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        if len(pages) > 1:
+            previous = self.client.get(response.data['previous'])
+            self.assertEqual([row[key] for row in previous.data['results']], pages[-2])
+        return [row_id for page in pages for row_id in page], len(pages)
+
+    def test_shop_search_sorts(self):
+        every_shop = sorted(shop.shop_id for shop in self.shops)
+        for sort_by in ['', 'recent', 'rating', 'alphabetical', 'relevance']:
+            with self.subTest(sort_by=sort_by):
+                seen, pages = self.walk(f'/api/shops/search/?pagination=cursor&sort_by={sort_by}')
+                self.assertEqual(sorted(seen), every_shop)
+                self.assertEqual(pages, 3)
+
+    def test_shop_search_text_and_distance(self):
+        seen, _ = self.walk('/api/shops/search/?pagination=cursor&q=chicken')
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), len(self.shops))
+
+        seen, _ = self.walk(
+            '/api/shops/search/?pagination=cursor&sort_by=distance&lat=1.30&lng=103.8&radius_m=5000')
+        self.assertEqual(seen, [shop.shop_id for shop in self.shops])
+
+    def test_shop_search_favourites(self):
+        seen, pages = self.walk('/api/shops/search/?pagination=cursor&sort_by=favourite',
+                                self.reviewers[0].user)
+        self.assertEqual(sorted(seen), sorted(shop.shop_id for shop in self.shops[:25]))
+        self.assertEqual(pages, 2)
+
+    def test_review_sorts(self):
+        shop_id = self.shops[0].shop_id
+        every_review = sorted(Review.objects.filter(shop_id=shop_id).values_list('review_id', flat=True))
+        for sort in ['', 'most_helpful', 'newest', 'highest_rating', 'lowest_rating',
+                     'most_liked', 'most_disliked']:
+            with self.subTest(sort=sort):
+                seen, pages = self.walk(f'/api/shops/{shop_id}/reviews/?pagination=cursor&sort={sort}')
+                self.assertEqual(sorted(seen), every_review)
+                self.assertEqual(pages, 2)
+
+    def test_shop_page_reviews_continue_in_review_listing(self):
+        shop_id = self.shops[0].shop_id
+        reviews = self.client.get(f'/api/shops/{shop_id}/page/?sections=reviews').data['reviews']
+        self.assertTrue(reviews['next'].startswith(f'http://testserver/api/shops/{shop_id}/reviews/?cursor='))
+        first = [row['review_id'] for row in reviews['results']]
+        rest, _ = self.walk(reviews['next'])
+        self.assertEqual(sorted(first + rest),
+                         sorted(Review.objects.filter(shop_id=shop_id).values_list('review_id', flat=True)))
+        self.assertEqual(len(first), 20)
+
+    def test_count_and_invalid_cursor(self):
+        response = self.client.get('/api/shops/search/?pagination=cursor&count=true')
+        self.assertEqual(response.data['count'], len(self.shops))
+        self.assertNotIn('count=', response.data['next'])
+        response = self.client.get('/api/shops/search/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ConditionalGetTests(TestCase):
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = make_shop()
+        cls.reviewer = make_reviewer('alice')
+        make_review(cls.shop, cls.reviewer)
+        rebuild_shop_stats([cls.shop.shop_id])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_if_none_match_returns_304_from_the_validator_query(self):
+        url = f'/api/shops/{self.shop.shop_id}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_change_invalidates_etag(self):
+        url = f'/api/shops/{self.shop.shop_id}/'
+        etag = self.client.get(url)['ETag']
+        ShopCategory.objects.create(shop=self.shop, category=Category.objects.create(category_name='Chinese'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_review_listing_etag_is_per_user(self):
+        url = f'/api/shops/{self.shop.shop_id}/reviews/'
+        anonymous = self.client.get(url)
+        self.client.force_authenticate(self.reviewer.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        make_review(self.shop, make_reviewer('bob'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_announcement_delete_moves_last_modified(self):
+        url = f'/api/shops/{self.shop.shop_id}/announcements/'
+        announcements = [Announcement.objects.create(shop=self.shop, title=title, description='-')
+                         for title in ('Opening', 'Closing')]
+        # Last-Modified has whole-second resolution
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Announcement.objects.update(updated_at=an_hour_ago)
+        Shop.objects.update(updated_at=an_hour_ago)
+
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        announcements[1].delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ReactionTests(TestCase):
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shop = make_shop()
+        cls.review = make_review(cls.shop, make_reviewer('author'))
+        cls.reviewer = make_reviewer('alice')
+        cls.url = f'/api/shops/{cls.shop.shop_id}/likes/{cls.review.review_id}/'
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.reviewer.user)
+
+    def assertCounts(self, likes, dislikes):
+        review = Review.objects.get(review_id=self.review.review_id)
+        self.assertEqual((review.like_count, review.dislike_count), (likes, dislikes))
+        self.assertEqual(Likes.objects.filter(review=self.review).count(), likes + dislikes)
+        return review
+
+    def test_upsert_toggles_reaction(self):
+        response = self.client.post(self.url, {'likeORdislike': True}, format='json')
+        self.assertEqual(response.status_code, 201)
+        review = self.assertCounts(1, 0)
+        self.assertGreater(review.helpfulness, 0)
+
+        # Repeating the same reaction changes nothing
+        response = self.client.post(self.url, {'likeORdislike': 'true'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertCounts(1, 0)
+
+        response = self.client.post(self.url, {'likeORdislike': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['likeORdislike'])
+        review = self.assertCounts(0, 1)
+        self.assertEqual(review.helpfulness, 0)
+
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertCounts(0, 0)
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+
+    def test_counters_match_rebuild(self):
+        for i in range(3):
+            self.client.force_authenticate(make_reviewer(f'liker-{i}').user)
+            self.client.post(self.url, {'likeORdislike': i != 1}, format='json')
+        review = self.assertCounts(2, 1)
+        Review.objects.filter(review_id=review.review_id).update(like_count=0, dislike_count=0, helpfulness=0)
+        rebuild_reaction_counts([review.review_id])
+        rebuilt = self.assertCounts(2, 1)
+        self.assertAlmostEqual(rebuilt.helpfulness, review.helpfulness)
+
+    def test_invalid_value(self):
+        response = self.client.post(self.url, {'likeORdislike': 'maybe'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'likeORdislike must be a boolean.')
+        self.assertCounts(0, 0)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ReviewImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shops = [make_shop(f'Shop {i}') for i in range(2)]
+        cls.reviewers = [make_reviewer(f'reviewer-{i}') for i in range(4)]
+
+    def setUp(self):
+        cache.clear()
+
+    def write(self, suffix, content):
+        fp = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8')
+        fp.write(content)
+        fp.close()
+        self.addCleanup(os.remove, fp.name)
+        return fp.name
+
+    def record(self, shop, reviewer, rating=4, **fields):
+        return {'shop': shop.shop_id, 'reviewer': reviewer.reviewer_id, 'rating': rating,
+                'description': 'tasty', **fields}
+
+    def test_skips_invalid_unknown_and_duplicate_rows(self):
+        shop, other = self.shops
+        make_review(other, self.reviewers[3])
+        lines = [
+            json.dumps(self.record(shop, self.reviewers[0], rating=5, has_freefood=True)),
+            json.dumps(self.record(shop, self.reviewers[1], rating=0)),
+            '{"shop": ',
+            json.dumps({'shop': 999999, 'reviewer': self.reviewers[1].reviewer_id, 'rating': 3}),
+            json.dumps(self.record(shop, self.reviewers[0], rating=1)),
+            json.dumps(self.record(other, self.reviewers[3])),
+            json.dumps(self.record(other, self.reviewers[2], rating=2, score=0.9, is_ai_generated=True)),
+        ]
+        importer = ReviewImporter(self.write('.ndjson', '\n'.join(lines) + '\n'), detect=False)
+        importer.run()
+
+        self.assertEqual((importer.imported, importer.skipped), (2, 5))
+        imported = Review.objects.get(shop=shop)
+        self.assertEqual((imported.rating, imported.has_freefood), (5, True))
+        self.assertEqual(imported.detection_status, Review.DetectionStatus.PENDING)
+        self.assertTrue(DetectionJob.objects.filter(review=imported).exists())
+        scored = Review.objects.get(shop=other, reviewer=self.reviewers[2])
+        self.assertTrue(scored.is_ai_generated)
+        self.assertFalse(DetectionJob.objects.filter(review=scored).exists())
+        self.assertEqual(ShopReviewStats.objects.get(shop=shop).rating_5_count, 1)
+        self.assertEqual(ShopReviewStats.objects.get(shop=other).review_count, 2)
+
+    def test_resumes_after_interruption(self):
+        shop, other = self.shops
+        rows = ['shop,reviewer,rating,description,has_freefood']
+        rows += [f'{s.shop_id},{r.reviewer_id},{i % 5 + 1},ok,False'
+                 for i, (s, r) in enumerate((s, r) for s in self.shops for r in self.reviewers)]
+        path = self.write('.csv', '\n'.join(rows) + '\n')
+
+        import_chunk = ReviewImporter.import_chunk
+        calls = []
+
+        def interrupt_second_chunk(importer, chunk, checkpoint):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            import_chunk(importer, chunk, checkpoint)
+
+        with mock.patch.object(ReviewImporter, 'import_chunk', interrupt_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                ReviewImporter(path, chunk_size=3, detect=False).run()
+        checkpoint = ReviewImportCheckpoint.objects.get(source=path)
+        self.assertEqual((checkpoint.rows_done, checkpoint.completed), (3, False))
+        self.assertEqual(Review.objects.count(), 3)
+        # The shops imported into so far were rebuilt on the way out
+        self.assertEqual(ShopReviewStats.objects.get(shop=shop).review_count, 3)
+
+        importer = ReviewImporter(path, chunk_size=3, detect=False)
+        importer.run()
+        self.assertEqual((importer.imported, importer.skipped), (5, 0))
+        self.assertEqual(Review.objects.count(), 8)
+        self.assertTrue(ReviewImportCheckpoint.objects.get(source=path).completed)
+        for s in self.shops:
+            self.assertEqual(ShopReviewStats.objects.get(shop=s).review_count, 4)
+
+        importer = ReviewImporter(path, detect=False)
+        importer.run()
+        self.assertEqual(importer.imported, 0)
+        self.assertEqual(Review.objects.count(), 8)
+
+
+class OutboxTests(TransactionTestCase):
+    """
+    Events are only read once their transaction has committed, hence
+    TransactionTestCase.
+    """
+
+    def setUp(self):
+        self.handled = []
+        self.fail_on = set()
+        outbox.consumer('test_probe', event_types=[outbox.SHOP_CREATED])(self.handle)
+        self.addCleanup(outbox._consumers.pop, 'test_probe')
+
+    def handle(self, events):
+        for event in events:
+            if event.payload['n'] in self.fail_on:
+                raise ValueError(f"cannot handle {event.payload['n']}")
+        self.handled.extend(event.payload['n'] for event in events)
+
+    def record(self, *numbers, event_type=outbox.SHOP_CREATED):
+        with transaction.atomic():
+            return [outbox.record_event(event_type, n=n) for n in numbers]
+
+    def checkpoint(self):
+        return OutboxCheckpoint.objects.get(consumer='test_probe')
+
+    def test_record_event_requires_transaction(self):
+        with self.assertRaises(RuntimeError):
+            outbox.record_event(outbox.SHOP_CREATED, n=0)
+
+    def test_checkpoint_advances_past_every_event_read(self):
+        self.record(1, 2)
+        self.record(3, event_type=outbox.SHOP_UPDATED)
+        last = self.record(4)[-1]
+
+        self.assertEqual(outbox.process_batch('test_probe', batch_size=2), 2)
+        self.assertEqual(self.handled, [1, 2])
+        # Events of other types are read past without reaching the handler
+        self.assertEqual(outbox.process_batch('test_probe', batch_size=2), 2)
+        self.assertEqual(self.handled, [1, 2, 4])
+        last.refresh_from_db()
+        self.assertEqual((self.checkpoint().last_txid, self.checkpoint().last_event_id),
+                         (last.txid, last.id))
+        self.assertEqual(outbox.process_batch('test_probe'), 0)
+        self.assertEqual(self.handled, [1, 2, 4])
+
+    def test_open_transaction_holds_back_later_events(self):
+        recorded, release = threading.Event(), threading.Event()
+
+        def long_transaction():
+            try:
+                with transaction.atomic():
+                    outbox.record_event(outbox.SHOP_CREATED, n=1)
+                    recorded.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=long_transaction)
+        thread.start()
+        recorded.wait(10)
+        self.record(2)
+        self.assertEqual(outbox.process_batch('test_probe'), 0)
+        release.set()
+        thread.join()
+        self.assertEqual(outbox.process_batch('test_probe'), 2)
+        self.assertEqual(self.handled, [1, 2])
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failing_event_is_retried_then_quarantined(self):
+        self.record(1, 2, 3)
+        self.fail_on = {2}
+        with self.assertRaises(ValueError):
+            outbox.process_batch('test_probe')
+        checkpoint = self.checkpoint()
+        self.assertEqual((checkpoint.last_event_id, checkpoint.failures), (0, 1))
+        self.assertEqual(checkpoint.last_error, 'ValueError: cannot handle 2')
+        self.assertEqual(self.handled, [])
+
+        quarantined = []
+        self.assertEqual(outbox.process_batch(
+            'test_probe', on_quarantine=lambda event, error: quarantined.append(event.payload['n'])), 3)
+        self.assertEqual((quarantined, self.handled), ([2], [1, 3]))
+        self.assertEqual(QuarantinedOutboxEvent.objects.get().payload, {'n': 2})
+        self.assertEqual(self.checkpoint().failures, 0)
+        self.assertEqual(outbox.process_batch('test_probe'), 0)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ReviewerLevelTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+
+    def test_promotion_follows_thresholds(self):
+        expected = {
+            (0, 0): Reviewer.Level.BRONZE,
+            (5, 10): Reviewer.Level.SILVER,
+            (20, 49): Reviewer.Level.SILVER,
+            (20, 50): Reviewer.Level.GOLD,
+            (50, 200): Reviewer.Level.PLATINUM,
+            (100, 5): Reviewer.Level.BRONZE,
+        }
+        reviewers = {}
+        for i, (reviews, likes) in enumerate(expected):
+            reviewer = make_reviewer(f'reviewer-{i}')
+            Reviewer.objects.filter(pk=reviewer.pk).update(
+                review_count=reviews, likes_received_count=likes)
+            reviewers[reviews, likes] = reviewer
+
+        # Chunks smaller than the reviewer count
+        self.assertEqual(promote_reviewers(chunk_size=2), 4)
+        for counters, level in expected.items():
+            self.assertEqual(Reviewer.objects.get(pk=reviewers[counters].pk).reviewer_level, level)
+        self.assertEqual(promote_reviewers(chunk_size=2), 0)
+
+        # Levels go down as well as up
+        Reviewer.objects.filter(pk=reviewers[50, 200].pk).update(likes_received_count=60)
+        self.assertEqual(promote_reviewers(), 1)
+        self.assertEqual(Reviewer.objects.get(pk=reviewers[50, 200].pk).reviewer_level, Reviewer.Level.GOLD)
+
+    def test_counters_follow_api_writes(self):
+        shops = [make_shop(f'Shop {i}') for i in range(2)]
+        author, liker = make_reviewer('author'), make_reviewer('liker')
+        self.client.force_authenticate(author.user)
+        review_ids = [
+            self.client.post(f'/api/shops/{shop.shop_id}/reviews/', {'rating': 4, 'description': 'ok'},
+                             format='json').data['review_id']
+            for shop in shops
+        ]
+        self.client.force_authenticate(liker.user)
+        self.client.post(f'/api/shops/{shops[0].shop_id}/likes/{review_ids[0]}/', {'likeORdislike': True},
+                         format='json')
+        author.refresh_from_db()
+        self.assertEqual((author.review_count, author.shops_reviewed_count, author.likes_received_count),
+                         (2, 2, 1))
+
+        self.client.force_authenticate(author.user)
+        self.client.delete(f'/api/shops/{shops[0].shop_id}/reviews/{review_ids[0]}/')
+        author.refresh_from_db()
+        self.assertEqual((author.review_count, author.shops_reviewed_count, author.likes_received_count),
+                         (1, 1, 0))
+
+    def test_recount_repairs_counters(self):
+        # Reviews written outside the API leave the counters behind
+        reviewer = make_reviewer('alice')
+        for i in range(5):
+            make_review(make_shop(f'Shop {i}'), reviewer, like_count=2)
+        self.assertEqual(promote_reviewers(), 0)
+
+        self.assertEqual(promote_reviewers(recount=True), 1)
+        reviewer.refresh_from_db()
+        self.assertEqual((reviewer.review_count, reviewer.shops_reviewed_count, reviewer.likes_received_count),
+                         (5, 5, 10))
+        self.assertEqual(reviewer.reviewer_level, Reviewer.Level.SILVER)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class DailyStatsTests(TransactionTestCase):
+    """
+    Outbox events only become readable once their transaction has
+    committed, hence TransactionTestCase.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.vendor = Vendor.objects.create(user=make_user('vendor', role=User.Role.VENDOR))
+        self.shop = make_shop(vendor=self.vendor)
+        self.reviewers = [make_reviewer(f'reviewer-{i}') for i in range(4)]
+        self.client = APIClient()
+
+    def review_on(self, day, reviewer, rating, **fields):
+        created_at = timezone.make_aware(datetime.combine(day, time(12)))
+        return make_review(self.shop, reviewer, rating=rating, created_at=created_at, **fields)
+
+    def daily_rows(self):
+        return list(ShopDailyReviewStats.objects.filter(shop=self.shop).order_by('day').values(
+            'day', 'review_count', 'rating_sum', 'rating_3_count', 'rating_5_count', 'ai_generated_count'))
+
+    def test_consumer_matches_rebuild(self):
+        self.review_on(date(2025, 3, 3), self.reviewers[0], 5)
+        deleted = self.review_on(date(2025, 3, 5), self.reviewers[1], 3)
+        self.review_on(date(2025, 3, 10), self.reviewers[2], 4, is_ai_generated=True)
+        rebuild_daily_stats([self.shop.shop_id])
+
+        self.client.force_authenticate(self.reviewers[3].user)
+        self.client.post(f'/api/shops/{self.shop.shop_id}/reviews/', {'rating': 5, 'description': 'new'},
+                         format='json')
+        self.client.force_authenticate(self.reviewers[1].user)
+        self.client.delete(f'/api/shops/{self.shop.shop_id}/reviews/{deleted.review_id}/')
+        run_consumer('shop_stats')
+
+        rows = self.daily_rows()
+        self.assertEqual([row['day'] for row in rows],
+                         [date(2025, 3, 3), date(2025, 3, 5), date(2025, 3, 10), timezone.localdate()])
+        self.assertEqual((rows[1]['review_count'], rows[1]['rating_3_count']), (0, 0))
+        self.assertEqual(rows[2]['ai_generated_count'], 1)
+        self.assertEqual((rows[3]['review_count'], rows[3]['rating_5_count']), (1, 1))
+        rebuild_daily_stats([self.shop.shop_id])
+        self.assertEqual(self.daily_rows(), rows)
+
+    def test_weekly_analytics(self):
+        self.review_on(date(2025, 3, 3), self.reviewers[0], 5)
+        self.review_on(date(2025, 3, 9), self.reviewers[1], 3)
+        self.review_on(date(2025, 3, 10), self.reviewers[2], 4)
+        rebuild_daily_stats([self.shop.shop_id])
+
+        self.client.force_authenticate(self.vendor.user)
+        response = self.client.get(
+            '/api/vendor/analytics/?interval=week&date_from=2025-03-03&date_to=2025-03-23')
+        self.assertEqual(response.status_code, 200)
+        buckets = [(b['start'], b['review_count'], b['average_rating']) for b in response.data['buckets']]
+        self.assertEqual(buckets, [('2025-03-03', 2, 4.0), ('2025-03-10', 1, 4.0), ('2025-03-17', 0, None)])
+        self.assertEqual(response.data['buckets'][0]['rating_distribution'][3], 1)
@@ -1,4 +1,4 @@
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, NotFound
 from rest_framework import viewsets, permissions, generics, serializers
 from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView
@@ -6,41 +6,90 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from datetime import timedelta
-from django.db.models import Count, Avg, Q
+from datetime import date, datetime, time, timedelta
+from functools import partial
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Count, DateField, Exists, F, FilteredRelation, FloatField, Max, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Trunc
 from django.utils import timezone
+from django.urls import reverse
 from django.core.exceptions import PermissionDenied
-from .models import Category, Region, Shop, Review, Reply, Likes, Favourite, Announcement, ShopCategory
-from .serializers import ReviewSerializer, CategorySerializer, RegionSerializer, ShopSerializer, LikesSerializer, FavouriteSerializer, ReplySerializer, AnnouncementSerializer
+from .models import Category, Region, Shop, ShopReviewStats, ShopDailyReviewStats, Review, Reply, Likes, Favourite, Announcement, ShopCategory
+from .serializers import ReviewSerializer, CategorySerializer, RegionSerializer, ShopSerializer, LikesSerializer, FavouriteSerializer, ReplySerializer, AnnouncementSerializer, ShopPageReviewSerializer
 from .onemap import get_latlng_from_postal
-from ml.ml import detector
-
-
-class CategoryView(viewsets.ModelViewSet):
+from .aggregates import review_state, state_payload
+from .reactions import set_reaction, remove_reaction
+from .detection import enqueue_detection
+from .reviewers import apply_reviewer_review_change, recount_reviewers
+from . import outbox
+from .exports import EXPORT_TYPES, export_lines
+from .conditional import ConditionalGetMixin
+from .search import search_shops, shop_facets
+from .geo import parse_point, filter_near, DEFAULT_RADIUS_M, MAX_RADIUS_M
+from .pagination import KeysetPagination, wants_cursor_pagination
+from .autocomplete import shop_index, SHOP, CATEGORY
+from .cache import SEARCH_CACHE_ENDPOINT, search_cache_key, search_cache_timeout, record_cache_access, cache_access_stats, review_summary_key
+from .cache import DASHBOARD_ENDPOINTS, VENDOR_DASHBOARD_ENDPOINT, VENDOR_SHOPS_ENDPOINT, REVIEWER_DASHBOARD_ENDPOINT, cached_dashboard, vendor_namespace, reviewer_namespace
+
+
+class CategoryView(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     permission_classes = [permissions.AllowAny]
 
     def get_serializer_class(self):
         return CategorySerializer
 
+    def get_validators(self):
+        # No timestamps on this small lookup table, so hash its contents
+        return list(Category.objects.order_by('category_id').values_list()), None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(partial(super().list, request, *args, **kwargs))
+
 
-class RegionView(viewsets.ModelViewSet):
+class RegionView(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Region.objects.all()
     permission_classes = [permissions.AllowAny]
 
     def get_serializer_class(self):
         return RegionSerializer
 
+    def get_validators(self):
+        return list(Region.objects.order_by('region_id').values_list()), None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(partial(super().list, request, *args, **kwargs))
+
 
 class ShopSearchView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
-        queryset = Shop.objects.all()
-
-        q = request.GET.get('q')
+        # Results only depend on the query parameters, except for favourites
+        if request.GET.get('sort_by') == 'favourite':
+            return self.search(request)
+
+        key = search_cache_key(request)
+        data = cache.get(key)
+        record_cache_access(SEARCH_CACHE_ENDPOINT, hit=data is not None)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        response = self.search(request)
+        if response.status_code == 200:
+            cache.set(key, response.data, search_cache_timeout())
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def search(self, request):
+        queryset = Shop.objects.with_listing_stats()
+
+        q = request.GET.get('q', '').strip()
         if q:
-            queryset = queryset.filter(shop_name__icontains=q)
+            queryset = search_shops(queryset, q)
+        ranked = 'search_rank' in queryset.query.annotations
 
         is_vegetarian = request.GET.get('is_vegetarian')
         if is_vegetarian == 'true':
@@ -64,36 +113,174 @@ class ShopSearchView(APIView):
             queryset = queryset.filter(region_id__in=region_ids).distinct()
 
         sort_by = request.GET.get('sort_by')
+
+        lat, lng = request.GET.get('lat'), request.GET.get('lng')
+        if lat or lng:
+            try:
+                lat, lng = parse_point(lat, lng)
+                radius_m = float(request.GET.get('radius_m', DEFAULT_RADIUS_M))
+            except (TypeError, ValueError):
+                return Response({'error': 'lat, lng and radius_m must be valid numbers'}, status=400)
+            radius_m = min(max(radius_m, 0), MAX_RADIUS_M)
+            queryset = filter_near(queryset, lat, lng, radius_m)
+        elif sort_by == 'distance':
+            return Response({'error': 'lat and lng are required to sort by distance'}, status=400)
+
         if sort_by == 'relevance':
-            queryset = queryset.annotate(num_reviews=Count(
-                'reviews')).order_by('-num_reviews')
+            if ranked:
+                queryset = queryset.order_by('-search_rank', '-review_count')
+            else:
+                queryset = queryset.order_by('-review_count')
         elif sort_by == 'rating':
-            queryset = queryset.annotate(avg_rating=Avg(
-                'reviews__rating')).order_by('-avg_rating')
+            queryset = queryset.annotate(avg_rating=Coalesce(
+                'review_stats__average_rating', Value(0.0))).order_by('-avg_rating')
         elif sort_by == 'alphabetical':
             queryset = queryset.order_by('shop_name')
         elif sort_by == 'recent':
             queryset = queryset.order_by('-created_at')
+        elif sort_by == 'distance':
+            queryset = queryset.order_by('distance_m')
         elif sort_by == 'favourite':
             queryset = queryset.filter(
                 favourites__reviewer=request.user.reviewer_profile).distinct()
+        elif ranked:
+            # Best text matches first when searching without an explicit sort
+            queryset = queryset.order_by('-search_rank')
 
-        paginator = PageNumberPagination()
-        paginator.page_size = 18
+        if wants_cursor_pagination(request):
+            paginator = KeysetPagination(page_size=18)
+        else:
+            paginator = PageNumberPagination()
+            paginator.page_size = 18
         result_page = paginator.paginate_queryset(queryset, request)
 
         serializer = ShopSerializer(result_page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        response = paginator.get_paginated_response(serializer.data)
+        if request.GET.get('facets') == 'true':
+            response.data['facets'] = shop_facets(queryset)
+        return response
+
+
+class AutocompleteView(APIView):
+    # Anonymous and answered from memory, so skip JWT decoding entirely
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+        except ValueError:
+            limit = 8
+        results = shop_index.lookup(request.GET.get('q', ''), limit)
+        return Response({
+            'shops': results[SHOP],
+            'categories': results[CATEGORY],
+        })
+
 
+class CacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
 
-class ShopDetailView(generics.RetrieveAPIView):
-    queryset = Shop.objects.all()
+    def get(self, request):
+        return Response({
+            endpoint: cache_access_stats(endpoint)
+            for endpoint in (SEARCH_CACHE_ENDPOINT, *DASHBOARD_ENDPOINTS)
+        })
+
+
+def reviewer_reactions(request, reviews):
+    """
+    The requesting reviewer's like (True) / dislike (False) per review, as
+    {review_id: likeORdislike}, for the given reviews in one query.
+    """
+    if not request.user.is_authenticated or not reviews:
+        return {}
+    reviewer = getattr(request.user, 'reviewer_profile', None)
+    if not reviewer:
+        return {}
+    return dict(Likes.objects.filter(reviewer=reviewer, review__in=reviews).values_list(
+        'review_id', 'likeORdislike'))
+
+
+class ShopPageView(APIView):
+    """
+    Everything the shop page renders, in one response and a fixed number of
+    queries: the shop, the most helpful reviews with their replies, recent
+    announcements and the rating summary. `sections` (comma separated)
+    selects which of the optional sections to include.
+    """
+    permission_classes = [permissions.AllowAny]
+    SECTIONS = ('reviews', 'announcements', 'summary')
+    REVIEW_LIMIT = 20
+    ANNOUNCEMENT_LIMIT = 5
+
+    def get(self, request, shop_id):
+        sections = request.GET.get('sections')
+        sections = set(sections.split(',')) if sections else set(self.SECTIONS)
+        unknown = sections - set(self.SECTIONS)
+        if unknown:
+            return Response({'error': f'Unknown sections: {", ".join(sorted(unknown))}'}, status=400)
+
+        shop = generics.get_object_or_404(
+            Shop.objects.with_listing_stats().select_related('review_stats'), shop_id=shop_id)
+        stats = getattr(shop, 'review_stats', None)
+        data = {'shop': ShopSerializer(shop, context={'request': request}).data}
+
+        if 'reviews' in sections:
+            data['reviews'] = self.get_reviews(request, shop, stats)
+        if 'announcements' in sections:
+            announcements = shop.announcements.order_by('-created_at')[:self.ANNOUNCEMENT_LIMIT]
+            data['announcements'] = AnnouncementSerializer(
+                announcements, many=True, context={'request': request}).data
+        if 'summary' in sections:
+            data['summary'] = {
+                'rating_distribution': stats.rating_distribution() if stats else {star: 0 for star in range(5, 0, -1)},
+                # Only served if shops/<id>/reviews/summary/ already generated it
+                'review_summary': cache.get(review_summary_key(shop_id)),
+            }
+        return Response(data)
+
+    def get_reviews(self, request, shop, stats):
+        # Same order as the review listing's default sort, so `next` carries
+        # on there
+        paginator = KeysetPagination(
+            page_size=self.REVIEW_LIMIT,
+            base_url=reverse('shop-reviews-list', args=[shop.shop_id]))
+        reviews = paginator.paginate_queryset(
+            shop.reviews.with_listing_data().prefetch_related('replies').order_by(
+                '-helpfulness', '-created_at'), request)
+        context = {'request': request, 'reactions': reviewer_reactions(request, reviews)}
+        return {
+            'count': stats.review_count if stats else 0,
+            'next': paginator.get_next_link(),
+            'results': ShopPageReviewSerializer(reviews, many=True, context=context).data,
+        }
+
+
+class ShopDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+    queryset = Shop.objects.with_listing_stats()
     serializer_class = ShopSerializer
     permission_classes = [permissions.AllowAny]
 
     def get_object(self):
         shop_id = self.kwargs['shop_id']
-        return generics.get_object_or_404(Shop, shop_id=shop_id)
+        return generics.get_object_or_404(self.get_queryset(), shop_id=shop_id)
+
+    def get_validators(self):
+        # Shop.updated_at is also touched when the shop's categories change
+        row = Shop.objects.filter(shop_id=self.kwargs['shop_id']).values(
+            'updated_at', 'review_stats__updated_at').first()
+        if row is None:
+            raise NotFound()
+        timestamps = [t for t in row.values() if t]
+        return list(row.values()), max(timestamps, default=None)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(partial(super().retrieve, request, *args, **kwargs))
+
+
+# Unreplied reviews listed in the vendor dashboard's Tasks section
+DASHBOARD_TASK_LIMIT = 20
 
 
 @api_view(['GET'])
@@ -109,39 +296,64 @@ def vendor_dashboard(request):
     except:
         return Response({'error': 'Vendor profile not found'}, status=404)
 
-    vendor_shops = Shop.objects.filter(vendor=vendor_profile)
-    total_shops = vendor_shops.count()
+    data, status = cached_dashboard(
+        VENDOR_DASHBOARD_ENDPOINT, vendor_namespace(vendor_profile.pk),
+        partial(vendor_dashboard_data, vendor_profile))
+    return Response(data, headers={'X-Cache': status})
 
-    all_reviews = Review.objects.filter(
-        shop__in=vendor_shops).order_by('-created_at')
-    total_reviews = all_reviews.count()
+
+def vendor_dashboard_data(vendor_profile):
+    # Windows are whole days (of the daily review rollup): the current and
+    # previous month, and the last 7 days including today vs the 7 before
+    today = timezone.localdate()
+    current_month_start = today.replace(day=1)
+
+    if today.month == 1:
+        prev_month_start = current_month_start.replace(
+            year=today.year - 1, month=12)
+    else:
+        prev_month_start = current_month_start.replace(month=today.month - 1)
+
+    last_week = today - timedelta(days=6)
+    prev_week = today - timedelta(days=13)
+
+    def window_avg(window):
+        return Cast(Sum('recent_days__rating_sum', filter=window), FloatField()) / \
+            NullIf(Sum('recent_days__review_count', filter=window), 0)
+
+    # Everything the dashboard shows per shop, for all of the vendor's shops,
+    # in one grouped query over the stored totals and the days in the windows
+    first_category = ShopCategory.objects.filter(
+        shop=OuterRef('pk')).order_by('pk').values('category__category_name')[:1]
+    shops = list(Shop.objects.filter(vendor=vendor_profile).annotate(
+        recent_days=FilteredRelation('daily_review_stats', condition=Q(
+            daily_review_stats__day__gte=min(prev_month_start, prev_week))),
+        review_count=Coalesce(F('review_stats__review_count'), 0),
+        avg_rating=F('review_stats__average_rating'),
+        recent_avg=window_avg(Q(recent_days__day__gte=last_week)),
+        previous_avg=window_avg(Q(recent_days__day__gte=prev_week, recent_days__day__lt=last_week)),
+        current_month_reviews=Coalesce(Sum('recent_days__review_count', filter=Q(
+            recent_days__day__gte=current_month_start)), 0),
+        prev_month_reviews=Coalesce(Sum('recent_days__review_count', filter=Q(
+            recent_days__day__gte=prev_month_start, recent_days__day__lt=current_month_start)), 0),
+        rating_sum=Coalesce(F('review_stats__rating_sum'), 0),
+        **{f'rating_{star}_count': Coalesce(F(f'review_stats__rating_{star}_count'), 0)
+           for star in range(1, 6)},
+        category_name=Subquery(first_category),
+    ).order_by('shop_id'))
+
+    total_shops = len(shops)
+    total_reviews = sum(shop.review_count for shop in shops)
 
     if total_reviews > 0:
-        avg_rating = all_reviews.aggregate(
-            avg_rating=Avg('rating'))['avg_rating']
+        avg_rating = sum(shop.rating_sum for shop in shops) / total_reviews
         avg_rating = round(avg_rating, 1) if avg_rating else 0
     else:
         avg_rating = 0
 
-    now = timezone.now()
-    current_month_start = now.replace(
-        day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    if now.month == 1:
-        prev_month_start = current_month_start.replace(
-            year=now.year - 1, month=12)
-        prev_month_end = current_month_start - timedelta(seconds=1)
-    else:
-        prev_month_start = current_month_start.replace(month=now.month - 1)
-        prev_month_end = current_month_start - timedelta(seconds=1)
-
     # Count reviews for current and previous month
-    current_month_reviews = all_reviews.filter(
-        created_at__gte=current_month_start).count()
-    prev_month_reviews = all_reviews.filter(
-        created_at__gte=prev_month_start,
-        created_at__lte=prev_month_end
-    ).count()
+    current_month_reviews = sum(shop.current_month_reviews for shop in shops)
+    prev_month_reviews = sum(shop.prev_month_reviews for shop in shops)
 
     # Calculate growth percentage
     if prev_month_reviews > 0:
@@ -152,10 +364,15 @@ def vendor_dashboard(request):
 
     monthly_growth = round(monthly_growth, 1)
 
-    # Get all unreplied reviews for Tasks section
-    unreplied_reviews = all_reviews.filter(
-        ~Q(replies__isnull=False)  # Reviews that don't have any replies
-    ).select_related('shop', 'reviewer__user')
+    # Newest unreplied reviews for the Tasks section
+    unreplied = Review.objects.filter(
+        shop__vendor=vendor_profile
+    ).exclude(
+        Exists(Reply.objects.filter(review=OuterRef('pk')))
+    )
+    unreplied_count = unreplied.count()
+    unreplied_reviews = unreplied.select_related(
+        'shop', 'reviewer__user').order_by('-created_at')[:DASHBOARD_TASK_LIMIT]
 
     unreplied_reviews_data = []
 
@@ -176,15 +393,12 @@ def vendor_dashboard(request):
     shops_trending_down = 0
     total_shop_ratings = []
 
-    for shop in vendor_shops:
-        shop_reviews = Review.objects.filter(shop=shop)
-        review_count = shop_reviews.count()
+    for shop in shops:
+        review_count = shop.review_count
 
         if review_count > 0:
-            shop_avg_rating = shop_reviews.aggregate(
-                avg_rating=Avg('rating'))['avg_rating']
             shop_avg_rating = round(
-                shop_avg_rating, 1) if shop_avg_rating else 0
+                shop.avg_rating, 1) if shop.avg_rating else 0
             total_shop_ratings.append(shop_avg_rating)
 
             # Check if shop needs attention (rating < 3.5)
@@ -193,17 +407,7 @@ def vendor_dashboard(request):
                 shops_needing_attention += 1
 
             # Check for declining trend (last 7 days vs previous 7 days)
-            last_week = now - timedelta(days=7)
-            prev_week = now - timedelta(days=14)
-
-            recent_reviews = shop_reviews.filter(created_at__gte=last_week)
-            previous_reviews = shop_reviews.filter(
-                created_at__gte=prev_week, created_at__lt=last_week)
-
-            recent_avg = recent_reviews.aggregate(avg_rating=Avg('rating'))[
-                'avg_rating'] if recent_reviews.exists() else None
-            previous_avg = previous_reviews.aggregate(avg_rating=Avg('rating'))[
-                'avg_rating'] if previous_reviews.exists() else None
+            recent_avg, previous_avg = shop.recent_avg, shop.previous_avg
 
             trending_down = False
             if recent_avg and previous_avg and recent_avg < (previous_avg - 0.2):
@@ -216,16 +420,12 @@ def vendor_dashboard(request):
             needs_attention = False
             trending_down = False
 
-        # Get shop's primary category (first category if multiple)
-        shop_category = shop.shop_categories.first()
-        category_name = shop_category.category.category_name if shop_category else 'General'
-
         shops_data.append({
             'id': shop.shop_id,
             'name': shop.shop_name,
             'rating': shop_avg_rating,
             'reviewCount': review_count,
-            'category': category_name,
+            'category': shop.category_name or 'General',
             'needsAttention': needs_attention,
             'trendingDown': trending_down
         })
@@ -255,19 +455,17 @@ def vendor_dashboard(request):
 
     # Calculate actual rating distribution
     rating_distribution = {
-        5: all_reviews.filter(rating=5).count(),
-        4: all_reviews.filter(rating=4).count(),
-        3: all_reviews.filter(rating=3).count(),
-        2: all_reviews.filter(rating=2).count(),
-        1: all_reviews.filter(rating=1).count()
+        star: sum(getattr(shop, f'rating_{star}_count') for shop in shops)
+        for star in range(5, 0, -1)
     }
 
-    return Response({
+    return {
         'total_reviews': total_reviews,
         'average_rating': avg_rating,
         'total_shops': total_shops,
         'monthly_growth': monthly_growth,
         'recent_reviews': unreplied_reviews_data,
+        'unreplied_count': unreplied_count,
         'shops': shops_data,
         'shop_performance': {
             'status': shop_status,
@@ -276,7 +474,7 @@ def vendor_dashboard(request):
             'shops_trending_down': shops_trending_down
         },
         'rating_distribution': rating_distribution
-    })
+    }
 
 # Vendor Reviews API for Reviews Page
 
@@ -286,7 +484,8 @@ def vendor_dashboard(request):
 def vendor_reviews(request):
     """
     Vendor Reviews API endpoint for the /vendor/reviews page
-    Returns all reviews for the vendor's shops with filtering options
+    Returns the vendor's reviews newest first, a page at a time (follow
+    `next`), with filtering options
     """
     user = request.user
 
@@ -301,26 +500,60 @@ def vendor_reviews(request):
 
     vendor_shops = Shop.objects.filter(vendor=vendor_profile)
 
+    shop_id = request.GET.get('shop_id')
+    if shop_id:
+        if not shop_id.isdigit() or not vendor_shops.filter(shop_id=shop_id).exists():
+            return Response({'error': 'Shop not found'}, status=404)
+        vendor_shops = vendor_shops.filter(shop_id=shop_id)
+
     reviews_queryset = Review.objects.filter(shop__in=vendor_shops).select_related(
         'shop', 'reviewer__user'
+    ).prefetch_related(
+        Prefetch('replies', queryset=Reply.objects.order_by('reply_id'))
     ).order_by('-created_at')
 
     # Apply filters from query parameters
     rating_filter = request.GET.get('rating')  # e.g., '5', '4', '3', '2', '1'
     unreplied_only = request.GET.get('unreplied')  # 'true' or 'false'
+    keyword = request.GET.get('q', '').strip()
 
+    rating = None
     if rating_filter and rating_filter.isdigit():
-        reviews_queryset = reviews_queryset.filter(rating=int(rating_filter))
+        rating = int(rating_filter)
+        reviews_queryset = reviews_queryset.filter(rating=rating)
 
     if unreplied_only == 'true':
         # Filter reviews that don't have any replies
         reviews_queryset = reviews_queryset.filter(replies__isnull=True)
 
-    # Serialize the reviews data with reply information
+    # Inclusive YYYY-MM-DD bounds, compared as timestamps so the
+    # (shop, created_at) index still applies
+    for param, lookup, offset in (('date_from', 'created_at__gte', 0), ('date_to', 'created_at__lt', 1)):
+        value = request.GET.get(param)
+        if not value:
+            continue
+        try:
+            day = date.fromisoformat(value)
+        except ValueError:
+            return Response({'error': f'{param} must be a date (YYYY-MM-DD)'}, status=400)
+        bound = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+        reviews_queryset = reviews_queryset.filter(**{lookup: bound})
+
+    if keyword:
+        reviews_queryset = reviews_queryset.filter(
+            Q(description__icontains=keyword) | Q(reviewer__user__username__icontains=keyword))
+
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 20)), 1), 100)
+    except ValueError:
+        page_size = 20
+    paginator = KeysetPagination(page_size=page_size)
+    page = paginator.paginate_queryset(reviews_queryset, request)
+
     reviews_data = []
-    for review in reviews_queryset:
-        # Get the reply for this review (if any)
-        reply = review.replies.first()
+    for review in page:
+        replies = review.replies.all()
+        reply = replies[0] if replies else None
 
         reply_data = None
         if reply:
@@ -341,9 +574,164 @@ def vendor_reviews(request):
             'reply': reply_data
         })
 
+    # Unfiltered and rating-only totals come from the stored per-shop stats;
+    # other filters need a count over the vendor's reviews
+    filtered = unreplied_only == 'true' or keyword or any(
+        request.GET.get(param) for param in ('date_from', 'date_to'))
+    if not filtered and rating is None:
+        total_count = ShopReviewStats.objects.filter(
+            shop__in=vendor_shops).aggregate(total=Sum('review_count'))['total'] or 0
+    elif not filtered and 1 <= rating <= 5:
+        total_count = ShopReviewStats.objects.filter(
+            shop__in=vendor_shops).aggregate(total=Sum(f'rating_{rating}_count'))['total'] or 0
+    else:
+        total_count = reviews_queryset.order_by().count()
+
     return Response({
         'reviews': reviews_data,
-        'total_count': len(reviews_data)
+        'total_count': total_count,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def vendor_reviews_export(request):
+    """
+    Stream every review of the vendor's shops (optionally one shop) as NDJSON
+    or CSV, with their replies. Memory use does not grow with the number of
+    reviews.
+    """
+    user = request.user
+
+    if user.role != 'vendor':
+        return Response({'error': 'User is not a vendor'}, status=403)
+
+    try:
+        vendor_profile = user.vendor_profile
+    except Exception as e:
+        return Response({'error': f'Vendor profile not found: {str(e)}'}, status=404)
+
+    # `type` rather than `format`, which DRF reserves for content negotiation
+    export_type = request.GET.get('type', 'ndjson')
+    if export_type not in EXPORT_TYPES:
+        return Response({'error': f'type must be one of: {", ".join(EXPORT_TYPES)}'}, status=400)
+
+    reviews = Review.objects.filter(shop__vendor=vendor_profile)
+    shop_id = request.GET.get('shop_id')
+    if shop_id:
+        if not shop_id.isdigit() or not Shop.objects.filter(shop_id=shop_id, vendor=vendor_profile).exists():
+            return Response({'error': 'Shop not found'}, status=404)
+        reviews = reviews.filter(shop_id=shop_id)
+
+    content_type = 'text/csv' if export_type == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_lines(reviews, export_type), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="reviews.{export_type}"'
+    return response
+
+# Vendor Analytics API for charts
+
+ANALYTICS_INTERVALS = ('day', 'week', 'month')
+# Default range per interval, ending today
+ANALYTICS_DEFAULT_DAYS = {'day': 30, 'week': 7 * 12, 'month': 365}
+MAX_ANALYTICS_BUCKETS = 400
+
+
+def _bucket_starts(interval, date_from, date_to):
+    if interval == 'week':
+        start = date_from - timedelta(days=date_from.weekday())
+    elif interval == 'month':
+        start = date_from.replace(day=1)
+    else:
+        start = date_from
+    while start <= date_to:
+        yield start
+        if interval == 'day':
+            start += timedelta(days=1)
+        elif interval == 'week':
+            start += timedelta(days=7)
+        else:
+            start = (start + timedelta(days=32)).replace(day=1)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def vendor_analytics(request):
+    """
+    Review count, average rating and rating distribution of the vendor's
+    shops per day, week or month, summed from the daily review rollup in one
+    grouped query. Every bucket in the range is returned, empty or not.
+    """
+    user = request.user
+
+    if user.role != 'vendor':
+        return Response({'error': 'User is not a vendor'}, status=403)
+
+    try:
+        vendor_profile = user.vendor_profile
+    except Exception as e:
+        return Response({'error': f'Vendor profile not found: {str(e)}'}, status=404)
+
+    interval = request.GET.get('interval', 'day')
+    if interval not in ANALYTICS_INTERVALS:
+        return Response({'error': f'interval must be one of: {", ".join(ANALYTICS_INTERVALS)}'}, status=400)
+
+    try:
+        date_to = date.fromisoformat(request.GET['date_to']) if request.GET.get(
+            'date_to') else timezone.localdate()
+        date_from = date.fromisoformat(request.GET['date_from']) if request.GET.get(
+            'date_from') else date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS[interval] - 1)
+    except ValueError:
+        return Response({'error': 'date_from and date_to must be dates (YYYY-MM-DD)'}, status=400)
+    if date_from > date_to:
+        return Response({'error': 'date_from must not be after date_to'}, status=400)
+
+    buckets = list(_bucket_starts(interval, date_from, date_to))
+    if len(buckets) > MAX_ANALYTICS_BUCKETS:
+        return Response({
+            'error': f'Range too long: at most {MAX_ANALYTICS_BUCKETS} {interval} buckets'
+        }, status=400)
+
+    vendor_shops = Shop.objects.filter(vendor=vendor_profile)
+    shop_ids = request.GET.get('shop_ids')
+    if shop_ids:
+        ids = shop_ids.split(',')
+        if not all(i.isdigit() for i in ids):
+            return Response({'error': 'shop_ids must be comma-separated shop ids'}, status=400)
+        ids = {int(i) for i in ids}
+        if vendor_shops.filter(shop_id__in=ids).count() != len(ids):
+            return Response({'error': 'Shop not found'}, status=404)
+        vendor_shops = vendor_shops.filter(shop_id__in=ids)
+
+    rows = ShopDailyReviewStats.objects.filter(
+        shop__in=vendor_shops, day__gte=date_from, day__lte=date_to
+    ).annotate(
+        bucket=Trunc('day', interval, output_field=DateField())
+    ).values('bucket').annotate(
+        review_count=Sum('review_count'),
+        rating_sum=Sum('rating_sum'),
+        **{f'rating_{star}_count': Sum(f'rating_{star}_count') for star in range(1, 6)}
+    ).order_by('bucket')
+    by_bucket = {row['bucket']: row for row in rows}
+
+    series = []
+    for start in buckets:
+        row = by_bucket.get(start, {})
+        review_count = row.get('review_count') or 0
+        series.append({
+            'start': start.isoformat(),
+            'review_count': review_count,
+            'average_rating': round(row['rating_sum'] / review_count, 2) if review_count else None,
+            'rating_distribution': {
+                star: row.get(f'rating_{star}_count') or 0 for star in range(5, 0, -1)
+            },
+        })
+
+    return Response({
+        'interval': interval,
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'buckets': series,
     })
 
 # Reply to Review API - Updated to use Reply model
@@ -383,12 +771,16 @@ def reply_to_review(request, review_id):
         return Response({'error': 'Reply description is required'}, status=400)
 
     # Create new Reply record
-    reply = Reply.objects.create(
-        vendor=vendor_profile,
-        review=review,
-        reply_description=reply_description,
-        reply_date=timezone.now()
-    )
+    with transaction.atomic():
+        reply = Reply.objects.create(
+            vendor=vendor_profile,
+            review=review,
+            reply_description=reply_description,
+            reply_date=timezone.now()
+        )
+        outbox.record_event(
+            outbox.REPLY_CREATED, reply_id=reply.reply_id, review_id=review.review_id,
+            shop_id=review.shop_id, vendor_id=vendor_profile.pk)
 
     return Response({
         'message': 'Reply posted successfully',
@@ -400,23 +792,45 @@ def reply_to_review(request, review_id):
     })
 
 
-class ReviewView(viewsets.ModelViewSet):
+class ReviewView(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # userReaction and has_freefood depend on the requesting user
+    per_user_response = True
+
+    def get_validators(self):
+        # Review writes bump updated_at (or the count on delete), and like
+        # changes touch the shop's stats row
+        row = Shop.objects.filter(shop_id=self.kwargs['shop_id']).annotate(
+            review_count=Count('reviews'), last_review=Max('reviews__updated_at')
+        ).values('review_count', 'last_review', 'review_stats__updated_at').first()
+        if row is None:
+            return [None], None
+        timestamps = [row['last_review'], row['review_stats__updated_at']]
+        return list(row.values()), max([t for t in timestamps if t], default=None)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(partial(super().list, request, *args, **kwargs))
+
+    @property
+    def paginator(self):
+        # Listings stay unpaginated unless the client opts into cursors
+        if not hasattr(self, '_paginator'):
+            self._paginator = KeysetPagination(page_size=20) if wants_cursor_pagination(
+                self.request) else None
+        return self._paginator
 
     def get_queryset(self):
-        queryset = Review.objects.filter(shop_id=self.kwargs['shop_id'])
+        queryset = Review.objects.filter(
+            shop_id=self.kwargs['shop_id']).with_listing_data()
         sort = self.request.GET.get('sort')
 
-        if sort == 'most_liked':
-            queryset = queryset.annotate(
-                like_count=Count('likes', filter=Q(likes__likeORdislike=True))
-            ).order_by('-like_count', '-created_at')
+        if sort in (None, 'most_helpful'):
+            queryset = queryset.order_by('-helpfulness', '-created_at')
+        elif sort == 'most_liked':
+            queryset = queryset.order_by('-like_count', '-created_at')
         elif sort == 'most_disliked':
-            queryset = queryset.annotate(
-                dislike_count=Count('likes', filter=Q(
-                    likes__likeORdislike=False))
-            ).order_by('-dislike_count', '-created_at')
+            queryset = queryset.order_by('-dislike_count', '-created_at')
         elif sort == 'newest':
             queryset = queryset.order_by('-created_at')
         elif sort == 'highest_rating':
@@ -426,6 +840,14 @@ class ReviewView(viewsets.ModelViewSet):
 
         return queryset
 
+    def get_serializer(self, *args, **kwargs):
+        # Load the requester's reactions for the whole page in one query
+        if kwargs.get('many') and args:
+            args = (list(args[0]), *args[1:])
+            kwargs.setdefault('context', self.get_serializer_context())
+            kwargs['context']['reactions'] = reviewer_reactions(self.request, args[0])
+        return super().get_serializer(*args, **kwargs)
+
     def perform_create(self, serializer):
         if not self.request.user.is_authenticated:
             raise serializers.ValidationError(
@@ -437,22 +859,21 @@ class ReviewView(viewsets.ModelViewSet):
                 "You have already reviewed this shop."
             )
 
-        result = detector(self.request.data.get('description', ''))
-        label = result[0]['label']
-        if (label == 'Human'):
-            is_ai_generated = False
-        elif (label == 'ChatGPT'):
-            is_ai_generated = True
-        score = result[0]['score']
-
-        # Save the review
-        review = serializer.save(
-            reviewer=self.request.user.reviewer_profile,
-            shop_id=self.kwargs['shop_id'],
-            has_freefood=self.request.data.get('has_freefood', False),
-            is_ai_generated=is_ai_generated,
-            score=score
-        )
+        # Save the review; the shop's stats are updated from the event by
+        # the shop_stats consumer and AI-generated detection runs later in
+        # the detection worker
+        with transaction.atomic():
+            review = serializer.save(
+                reviewer=self.request.user.reviewer_profile,
+                shop_id=self.kwargs['shop_id'],
+                has_freefood=self.request.data.get('has_freefood', False),
+                detection_status=Review.DetectionStatus.PENDING,
+            )
+            apply_reviewer_review_change(review.reviewer_id, review.shop_id, 1)
+            enqueue_detection(review)
+            outbox.record_event(
+                outbox.REVIEW_CREATED, **outbox.review_payload(review),
+                old=None, new=state_payload(review_state(review)))
 
     def perform_update(self, serializer):
         if not self.request.user.is_authenticated:
@@ -463,28 +884,30 @@ class ReviewView(viewsets.ModelViewSet):
             raise serializers.ValidationError(
                 "You can only update your own reviews.")
 
-        result = detector(self.request.data.get('description', ''))
-        label = result[0]['label']
-        if (label == 'Human'):
-            is_ai_generated = False
-        elif (label == 'ChatGPT'):
-            is_ai_generated = True
-        score = result[0]['score']
-
-        serializer.save(
-            reviewer=self.request.user.reviewer_profile,
-            shop_id=self.kwargs['shop_id'],
-            has_freefood=self.request.data.get('has_freefood', False),
-            is_ai_generated=is_ai_generated,
-            score=score
-        )
+        old_state = review_state(serializer.instance)
+        old_description = serializer.instance.description
+        with transaction.atomic():
+            review = serializer.save(
+                reviewer=self.request.user.reviewer_profile,
+                shop_id=self.kwargs['shop_id'],
+                has_freefood=self.request.data.get('has_freefood', False),
+            )
+            if review.description != old_description:
+                enqueue_detection(review)
+            outbox.record_event(
+                outbox.REVIEW_UPDATED, **outbox.review_payload(review),
+                old=state_payload(old_state), new=state_payload(review_state(review)))
+
+    def perform_destroy(self, instance):
+        shop_id = instance.shop_id
+        payload = outbox.review_payload(instance)
+        payload.update(old=state_payload(review_state(instance)), new=None)
+        with transaction.atomic():
+            instance.delete()
+            apply_reviewer_review_change(
+                instance.reviewer_id, shop_id, -1, likes=instance.like_count)
+            outbox.record_event(outbox.REVIEW_DELETED, **payload)
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context['request'] = self.request
-        reviews = Review.objects.filter(shop_id=self.kwargs['shop_id'])
-        context['reviews'] = reviews
-        return context
 
 
 class LikeDetailView(CreateAPIView):
@@ -496,28 +919,17 @@ class LikeDetailView(CreateAPIView):
         likeORdislike = request.data.get('likeORdislike')
         if likeORdislike is None:
             return Response({'detail': 'likeORdislike is required.'}, status=400)
-        existing = Likes.objects.filter(
-            review_id=review_id, reviewer=reviewer).first()
-        if existing:
-            existing.likeORdislike = likeORdislike
-            existing.save()
-            serializer = LikesSerializer(existing)
-            return Response(serializer.data, status=200)
-        else:
-            like = Likes.objects.create(
-                reviewer=reviewer,
-                review_id=review_id,
-                likeORdislike=likeORdislike
-            )
-            serializer = LikesSerializer(like)
-            return Response(serializer.data, status=201)
+        try:
+            likeORdislike = serializers.BooleanField().to_internal_value(likeORdislike)
+        except serializers.ValidationError:
+            return Response({'detail': 'likeORdislike must be a boolean.'}, status=400)
+        like, created = set_reaction(reviewer, review_id, likeORdislike)
+        serializer = LikesSerializer(like)
+        return Response(serializer.data, status=201 if created else 200)
 
     def delete(self, request, shop_id, review_id):
         reviewer = request.user.reviewer_profile
-        existing = Likes.objects.filter(
-            review_id=review_id, reviewer=reviewer).first()
-        if existing:
-            existing.delete()
+        if remove_reaction(reviewer, review_id):
             return Response({'detail': 'Like/dislike removed.'}, status=204)
         else:
             return Response({'detail': 'No like/dislike to remove.'}, status=404)
@@ -552,10 +964,13 @@ class FavouriteView(viewsets.ModelViewSet):
             return Response({'detail': 'You have already favorited this shop.'}, status=400)
 
         # Create a new favorite
-        favourite = Favourite.objects.create(
-            reviewer=request.user.reviewer_profile,
-            shop=shop
-        )
+        with transaction.atomic():
+            favourite = Favourite.objects.create(
+                reviewer=request.user.reviewer_profile,
+                shop=shop
+            )
+            outbox.record_event(
+                outbox.FAVOURITE_ADDED, shop_id=shop.shop_id, reviewer_id=favourite.reviewer_id)
         serializer = self.get_serializer(favourite)
         return Response(serializer.data, status=201)
 
@@ -586,7 +1001,10 @@ class FavouriteView(viewsets.ModelViewSet):
             return Response({'detail': 'Favorite not found.'}, status=404)
 
         # Delete the favorite
-        favorite.delete()
+        with transaction.atomic():
+            favorite.delete()
+            outbox.record_event(
+                outbox.FAVOURITE_REMOVED, shop_id=shop.shop_id, reviewer_id=favorite.reviewer_id)
         return Response({'detail': 'Favorite removed.'}, status=200)
 
 
@@ -601,7 +1019,7 @@ class ReplyView(viewsets.ModelViewSet):
         return Reply.objects.none()
 
 
-class PublicAnnouncementView(viewsets.ReadOnlyModelViewSet):
+class PublicAnnouncementView(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = AnnouncementSerializer
     permission_classes = [permissions.AllowAny]
 
@@ -613,6 +1031,21 @@ class PublicAnnouncementView(viewsets.ReadOnlyModelViewSet):
         # Return an empty queryset if shop_id is not provided
         return Announcement.objects.none()
 
+    def get_validators(self):
+        # Deleting an announcement touches Shop.updated_at, so the removal
+        # also moves Last-Modified forward
+        row = Shop.objects.filter(shop_id=self.kwargs.get('shop_id')).annotate(
+            announcement_count=Count('announcements'),
+            last_announcement=Max('announcements__updated_at'),
+        ).values('announcement_count', 'last_announcement', 'updated_at').first()
+        if row is None:
+            return [None], None
+        timestamps = [t for t in (row['last_announcement'], row['updated_at']) if t]
+        return list(row.values()), max(timestamps, default=None)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(partial(super().list, request, *args, **kwargs))
+
 
 class AnnouncementView(viewsets.ModelViewSet):
     serializer_class = AnnouncementSerializer
@@ -687,36 +1120,37 @@ def vendor_shops(request):
     except:
         return Response({'error': 'Vendor profile not found'}, status=404)
 
-    # Get vendor's shops with review data
-    shops = Shop.objects.filter(vendor=vendor_profile)
+    data, status = cached_dashboard(
+        VENDOR_SHOPS_ENDPOINT, vendor_namespace(vendor_profile.pk),
+        partial(vendor_shops_data, vendor_profile))
+    return Response(data, headers={'X-Cache': status})
+
+
+def vendor_shops_data(vendor_profile):
+    # Get vendor's shops with review data, from the stats rows, and their
+    # categories in a fixed number of queries however many shops there are
+    shops = Shop.objects.filter(vendor=vendor_profile).with_listing_stats().prefetch_related(
+        'shop_categories__category')
     shops_data = []
 
     for shop in shops:
-        shop_reviews = Review.objects.filter(shop=shop)
-        review_count = shop_reviews.count()
-
-        if review_count > 0:
-            avg_rating = shop_reviews.aggregate(
-                avg_rating=Avg('rating'))['avg_rating']
-            avg_rating = round(avg_rating, 1) if avg_rating else 0
-        else:
-            avg_rating = 0
+        avg_rating = round(shop.average_rating, 1) if shop.average_rating else 0
 
-        # Get shop's primary category
-        shop_category = shop.shop_categories.first()
+        # Get shop's primary category (the first one added)
+        shop_category = min(shop.shop_categories.all(), key=lambda sc: sc.pk, default=None)
         category_name = shop_category.category.category_name if shop_category else 'General'
 
         shops_data.append({
             'id': shop.shop_id,
             'name': shop.shop_name,
             'rating': avg_rating,
-            'reviewCount': review_count,
+            'reviewCount': shop.review_count,
             'category': category_name,
             'status': 'active' if shop.claim_status else 'inactive',
             'created_at': shop.created_at.isoformat() if hasattr(shop, 'created_at') else '2025-01-01T00:00:00Z'
         })
 
-    return Response({'shops': shops_data})
+    return {'shops': shops_data}
 
 
 @api_view(['POST'])
@@ -739,23 +1173,25 @@ def create_vendor_shop(request):
         # Create shop
         postal_code = request.data.get('postal_code')
         lat, lng = get_latlng_from_postal(postal_code)
-        shop = Shop.objects.create(
-            shop_name=request.data.get('shop_name'),
-            shop_description=request.data.get('shop_description'),
-            shop_image=request.FILES.get('shop_image'),
-            vendor=vendor_profile,
-            region_id=request.data.get('region'),
-            is_halal=request.data.get('is_halal', 'false').lower() == 'true',
-            is_vegetarian=request.data.get(
-                'is_vegetarian', 'false').lower() == 'true',
-            claim_status=request.data.get(
-                'claim_status', 'true').lower() == 'true',
-            address_line1=request.data.get('address1'),
-            address_line2=request.data.get('address2', ''),
-            postal_code=postal_code,
-            latitude=lat,
-            longitude=lng,
-        )
+        with transaction.atomic():
+            shop = Shop.objects.create(
+                shop_name=request.data.get('shop_name'),
+                shop_description=request.data.get('shop_description'),
+                shop_image=request.FILES.get('shop_image'),
+                vendor=vendor_profile,
+                region_id=request.data.get('region'),
+                is_halal=request.data.get('is_halal', 'false').lower() == 'true',
+                is_vegetarian=request.data.get(
+                    'is_vegetarian', 'false').lower() == 'true',
+                claim_status=request.data.get(
+                    'claim_status', 'true').lower() == 'true',
+                address_line1=request.data.get('address1'),
+                address_line2=request.data.get('address2', ''),
+                postal_code=postal_code,
+                latitude=lat,
+                longitude=lng,
+            )
+            outbox.record_event(outbox.SHOP_CREATED, shop_id=shop.shop_id, vendor_id=vendor_profile.pk)
 
         return Response({
             'shop_id': shop.shop_id,
@@ -819,18 +1255,20 @@ def update_vendor_shop(request, shop_id):
         if 'shop_image' in request.FILES:
             shop.shop_image = request.FILES['shop_image']
 
-        shop.save()
+        with transaction.atomic():
+            shop.save()
 
-        # Update shop category if provided
-        category_id = request.data.get('category')
-        if category_id:
-            # Clear existing categories and add new one
-            shop.shop_categories.all().delete()
-            try:
-                category = Category.objects.get(category_id=category_id)
-                ShopCategory.objects.create(shop=shop, category=category)
-            except Category.DoesNotExist:
-                pass  # Ignore invalid category
+            # Update shop category if provided
+            category_id = request.data.get('category')
+            if category_id:
+                # Clear existing categories and add new one
+                shop.shop_categories.all().delete()
+                try:
+                    category = Category.objects.get(category_id=category_id)
+                    ShopCategory.objects.create(shop=shop, category=category)
+                except Category.DoesNotExist:
+                    pass  # Ignore invalid category
+            outbox.record_event(outbox.SHOP_UPDATED, shop_id=shop.shop_id, vendor_id=vendor_profile.pk)
 
         return Response({
             'shop_id': shop.shop_id,
@@ -868,10 +1306,14 @@ def add_shop_category(request, shop_id):
         category = Category.objects.get(category_id=category_id)
 
         # Create or get shop category relationship
-        ShopCategory.objects.get_or_create(
-            shop=shop,
-            category=category
-        )
+        with transaction.atomic():
+            _, created = ShopCategory.objects.get_or_create(
+                shop=shop,
+                category=category
+            )
+            if created:
+                outbox.record_event(
+                    outbox.SHOP_UPDATED, shop_id=shop.shop_id, vendor_id=vendor_profile.pk)
 
         return Response({
             'message': 'Category added successfully'
@@ -902,86 +1344,73 @@ def reviewer_dashboard(request):
         return Response({'error': f'Reviewer profile not found: {str(e)}'}, status=400)
 
     try:
+        data, status = cached_dashboard(
+            REVIEWER_DASHBOARD_ENDPOINT, reviewer_namespace(reviewer_profile.pk),
+            partial(reviewer_dashboard_data, reviewer_profile))
+    except Exception as e:
+        return Response({
+            'error': f'Failed to get dashboard data: {str(e)}'
+        }, status=400)
+    return Response(data, headers={'X-Cache': status})
 
-        # Get current date for this month calculations
-        current_date = timezone.now()
-        current_month_start = current_date.replace(
-            day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # Calculate stats
-        total_reviews = Review.objects.filter(
-            reviewer=reviewer_profile).count()
-
-        total_shops_reviewed = Review.objects.filter(
-            reviewer=reviewer_profile).values('shop').distinct().count()
-        total_likes_received = Likes.objects.filter(
-            review__reviewer=reviewer_profile, likeORdislike=True).count()
-        reviews_this_month = Review.objects.filter(
-            reviewer=reviewer_profile,
-            created_at__gte=current_month_start
-        ).count()
-
-        # Get recent reviews (last 5)
-        recent_reviews = Review.objects.filter(
-            reviewer=reviewer_profile).select_related('shop').order_by('-created_at')[:5]
-        recent_reviews_data = []
-        for review in recent_reviews:
-            likes_count = Likes.objects.filter(
-                review=review, likeORdislike=True).count()
-            recent_reviews_data.append({
-                'review_id': review.review_id,
-                'shop_name': review.shop.shop_name,
-                'rating': review.rating,
-                'description': review.description,
-                'created_at': review.created_at,
-                'likes_count': likes_count,
-                'has_freefood': review.has_freefood
-            })
 
-        # Get recently visited shops (shops user has reviewed, ordered by most recent review)
-        visited_shops_data = []
-        try:
-            reviewed_shops = Review.objects.filter(reviewer=reviewer_profile).select_related(
-                'shop').order_by('-created_at').values_list('shop', flat=True).distinct()[:6]
-            for shop_id in reviewed_shops:
-                try:
-                    shop = Shop.objects.get(shop_id=shop_id)
-                    # Get review count and average rating for this shop
-                    shop_stats = Review.objects.filter(shop=shop).aggregate(
-                        review_count=Count('review_id'),
-                        avg_rating=Avg('rating')
-                    )
-                    # Get shop category (required during shop creation)
-                    category = shop.shop_categories.first().category.category_name
-
-                    visited_shops_data.append({
-                        'shop_id': shop.shop_id,
-                        'shop_name': shop.shop_name,
-                        'shop_image': shop.shop_image.url if shop.shop_image else None,
-                        'review_count': shop_stats['review_count'] or 0,
-                        'avg_rating': float(shop_stats['avg_rating'] or 0),
-                        'category': category
-                    })
-                except Shop.DoesNotExist:
-                    continue
-        except Exception as e:
-            visited_shops_data = []
+def reviewer_dashboard_data(reviewer_profile):
+    # Get current date for this month calculations
+    current_date = timezone.now()
+    current_month_start = current_date.replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0)
 
-        return Response({
-            'stats': {
-                'total_reviews': total_reviews,
-                'total_shops_reviewed': total_shops_reviewed,
-                'total_likes_received': total_likes_received,
-                'reviews_this_month': reviews_this_month
-            },
-            'recent_reviews': recent_reviews_data,
-            'recently_visited_shops': visited_shops_data
+    reviews = Review.objects.filter(reviewer=reviewer_profile)
+
+    # Totals are the reviewer's stored counters
+    stats = {
+        'total_reviews': reviewer_profile.review_count,
+        'total_shops_reviewed': reviewer_profile.shops_reviewed_count,
+        'total_likes_received': reviewer_profile.likes_received_count,
+        'reviews_this_month': reviews.filter(created_at__gte=current_month_start).count(),
+        'reviewer_level': reviewer_profile.reviewer_level,
+    }
+
+    # Get recent reviews (last 5)
+    recent_reviews = reviews.select_related('shop').order_by('-created_at')[:5]
+    recent_reviews_data = []
+    for review in recent_reviews:
+        recent_reviews_data.append({
+            'review_id': review.review_id,
+            'shop_name': review.shop.shop_name,
+            'rating': review.rating,
+            'description': review.description,
+            'created_at': review.created_at,
+            'likes_count': review.like_count,
+            'has_freefood': review.has_freefood
         })
 
-    except Exception as e:
-        return Response({
-            'error': f'Failed to get dashboard data: {str(e)}'
-        }, status=400)
+    # Get recently visited shops (shops user has reviewed, ordered by most
+    # recent review), grouped per shop so each appears once
+    reviewed_shops = Shop.objects.filter(reviews__reviewer=reviewer_profile).annotate(
+        last_reviewed=Max('reviews__created_at')
+    ).select_related('review_stats').prefetch_related(
+        Prefetch('shop_categories', queryset=ShopCategory.objects.select_related(
+            'category').order_by('pk'))
+    ).order_by('-last_reviewed', '-shop_id')[:6]
+    visited_shops_data = []
+    for shop in reviewed_shops:
+        shop_stats = getattr(shop, 'review_stats', None)
+        categories = shop.shop_categories.all()
+        visited_shops_data.append({
+            'shop_id': shop.shop_id,
+            'shop_name': shop.shop_name,
+            'shop_image': shop.shop_image.url if shop.shop_image else None,
+            'review_count': shop_stats.review_count if shop_stats else 0,
+            'avg_rating': float(shop_stats.average_rating or 0) if shop_stats else 0.0,
+            'category': categories[0].category.category_name if categories else 'General'
+        })
+
+    return {
+        'stats': stats,
+        'recent_reviews': recent_reviews_data,
+        'recently_visited_shops': visited_shops_data
+    }
 
 
 @api_view(['GET'])
@@ -990,7 +1419,9 @@ def reviewer_reviews(request):
     try:
         reviewer = request.user.reviewer_profile
         
-        reviews_queryset = Review.objects.filter(reviewer=reviewer).select_related('shop').order_by('-created_at')
+        # Likes and dislikes together, from the stored counters
+        reviews_queryset = Review.objects.filter(reviewer=reviewer).select_related('shop').annotate(
+            likes_count=F('like_count') + F('dislike_count')).order_by('-created_at')
         
         paginator = PageNumberPagination()
         paginator.page_size = 10
@@ -998,7 +1429,6 @@ def reviewer_reviews(request):
         
         reviews_data = []
         for review in result_page:
-            likes_count = Likes.objects.filter(review=review).count()
             reviews_data.append({
                 'review_id': review.review_id,
                 'shop_name': review.shop.shop_name,
@@ -1006,7 +1436,7 @@ def reviewer_reviews(request):
                 'rating': review.rating,
                 'description': review.description,
                 'created_at': review.created_at.strftime('%b %d, %Y'),
-                'likes_count': likes_count,
+                'likes_count': review.likes_count,
                 'has_freefood': review.has_freefood
             })
         
@@ -1033,7 +1463,14 @@ def delete_vendor_shop(request, shop_id):
     
     try:
         shop = Shop.objects.get(shop_id=shop_id, vendor=vendor_profile)
-        shop.delete()
+        with transaction.atomic():
+            # The shop's reviews (and their likes) go with it, so their
+            # authors' counters are recounted once they are gone
+            reviewer_ids = sorted(set(shop.reviews.values_list('reviewer_id', flat=True)))
+            shop.delete()
+            recount_reviewers(reviewer_ids)
+            outbox.record_event(outbox.SHOP_DELETED, shop_id=int(shop_id), vendor_id=vendor_profile.pk,
+                                reviewer_ids=reviewer_ids)
         return Response({'message': 'Shop deleted successfully'}, status=200)
     except Shop.DoesNotExist:
         return Response({'error': 'Shop not found or access denied'}, status=404)
@@ -89,6 +89,11 @@ class Reviewer(models.Model):
     reviewer_level = models.CharField(
         max_length=50, choices=Level.choices, default=Level.BRONZE
     )
+    # Kept current by shops.reviewers on review and like writes; the level is
+    # recomputed from them by `manage.py promote_reviewers`
+    review_count = models.PositiveIntegerField(default=0)
+    shops_reviewed_count = models.PositiveIntegerField(default=0)
+    likes_received_count = models.PositiveIntegerField(default=0)
 
     def save(self, *args, **kwargs):
         if not self.pk: